@@ -1,20 +1,70 @@
-from scripts.packages import sys, QIcon, QMenuBar, QAction, QWidget, QVBoxLayout, Qt, QLabel, QTextEdit, QPixmap, QApplication, QMainWindow
+import sys
+from scripts.importTimer import ImportTimer
+
+# Installed before anything heavy is imported so the whole startup is covered
+IMPORT_TIMER = ImportTimer.from_environment(sys.argv)
+
+import os
+import importlib
+import threading
+from scripts.packages import QMenuBar, QAction, QWidget, QVBoxLayout, Qt, QLabel, QTextEdit, QApplication, QMainWindow, QTimer
 from scripts.textStorage import load_text
-from scripts.production import ProductionWindow
-from scripts.transportationFactory import FactoryWindow
-from scripts.manufacturing import ManufacturingWindow
-from scripts.transportationSite import SiteWindow 
-from scripts.construction import ConstructionWindow
-from scripts.total import TotalWindow
+from scripts.resources import ResourceCache
+from scripts.modelRegistry import ModelRegistry
+from scripts.stages import STAGE_ORDER
+
+# Stage windows pull in pandas/numpy, so they are imported on first use
+# (or by the background preload) instead of before the main window paints
+STAGE_WINDOWS = {
+    "Production": ("scripts.production", "ProductionWindow"),
+    "Transportation to Factory": ("scripts.transportationFactory", "FactoryWindow"),
+    "Manufacturing": ("scripts.manufacturing", "ManufacturingWindow"),
+    "Transportation to Site": ("scripts.transportationSite", "SiteWindow"),
+    "Construction": ("scripts.construction", "ConstructionWindow"),
+    "Total Carbon Emission": ("scripts.total", "TotalWindow")
+}
+
+def load_window_class(button_name):
+    module_name, class_name = STAGE_WINDOWS[button_name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+# Optional JSON file that keeps memoized predictions between sessions
+PREDICTION_CACHE_FILE = os.environ.get('CARBON_PREDICTION_CACHE')
+
+def save_prediction_cache():
+    from scripts.predictionCache import PredictionCache
+    PredictionCache().save(PREDICTION_CACHE_FILE)
+
+def start_background_loading():
+    """Import the stage modules and unpickle the models off the GUI thread."""
+    def preload():
+        if PREDICTION_CACHE_FILE:
+            from scripts.predictionCache import PredictionCache
+            PredictionCache().load(PREDICTION_CACHE_FILE)
+        for button_name in STAGE_WINDOWS:
+            try:
+                load_window_class(button_name)
+            except Exception as e:
+                print(f"Error preloading {button_name}: {e}")
+        ModelRegistry().warm_up().join()
+        if IMPORT_TIMER:
+            IMPORT_TIMER.mark("background loading finished")
+
+    thread = threading.Thread(target=preload, name="stage-preload", daemon=True)
+    thread.start()
+    return thread
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
 
         self.setWindowTitle("Smart Carbon Predictor")
-        self.setWindowIcon(QIcon("resources/images/favicon.png"))
+        self.setWindowIcon(ResourceCache().icon("resources/images/favicon.png"))
         self.setFixedSize(680, 560)
 
+        # Stage dialogs are created on first use and reopened afterwards
+        self.windows = {}
+
         self.setup_menu()
         self.setup_ui()
 
@@ -36,6 +86,19 @@ class MainWindow(QMainWindow):
             action.triggered.connect(lambda _, text=btn_text: self.on_button_clicked(text))
             menu_bar.addAction(action)
 
+        # Table editors for many line items per stage, one per stage button above
+        line_items_menu = menu_bar.addMenu("Line Items")
+        for btn_text, stage_name in zip(buttons, STAGE_ORDER):
+            action = QAction(btn_text, self)
+            action.triggered.connect(lambda _, stage_name=stage_name: self.open_line_items(stage_name))
+            line_items_menu.addAction(action)
+
+        options_menu = menu_bar.addMenu("Options")
+        self.keep_inputs_action = QAction("Keep Inputs Between Visits", self)
+        self.keep_inputs_action.setCheckable(True)
+        self.keep_inputs_action.setChecked(True)
+        options_menu.addAction(self.keep_inputs_action)
+
     def setup_ui(self):
         self.central_widget = QWidget(self)
         self.setCentralWidget(self.central_widget)
@@ -54,26 +117,33 @@ class MainWindow(QMainWindow):
         self.show_welcome_screen()
 
     def show_welcome_screen(self):
-        pixmap = QPixmap("resources/images/logo.png")
-        self.image_label.setPixmap(pixmap.scaled(
-            300, 300, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        self.image_label.setPixmap(ResourceCache().pixmap("resources/images/logo.png", 300, 300))
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.show()
         self.text_edit.show()
 
     def on_button_clicked(self, button_name):
-        if button_name == "Production":
-            self.open_window(ProductionWindow())
-        elif button_name == "Transportation to Factory": 
-            self.open_window(FactoryWindow())
-        elif button_name == "Manufacturing":
-            self.open_window(ManufacturingWindow())
-        elif button_name == "Transportation to Site":
-            self.open_window(SiteWindow())
-        elif button_name == "Construction":
-            self.open_window(ConstructionWindow())
-        elif button_name == "Total Carbon Emission":
-            self.open_window(TotalWindow())
+        if button_name not in STAGE_WINDOWS:
+            return
+        window = self.windows.get(button_name)
+        if window is None:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                window = self.windows[button_name] = load_window_class(button_name)()
+            finally:
+                QApplication.restoreOverrideCursor()
+        elif not self.keep_inputs_action.isChecked() and hasattr(window, 'reset_inputs'):
+            window.reset_inputs()
+        self.open_window(window)
+
+    def open_line_items(self, stage_name):
+        window = self.windows.get(('line_items', stage_name))
+        if window is None:
+            from scripts.bomWindow import BomWindow
+            window = self.windows[('line_items', stage_name)] = BomWindow(stage_name, self)
+        # Modeless, so the table can stay open next to the stage dialogs
+        window.show()
+        window.raise_()
 
     def open_window(self, window):
         window.exec_()
@@ -81,9 +151,21 @@ class MainWindow(QMainWindow):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
 
-    with open("styles.qss", "r") as file:
-        app.setStyleSheet(file.read())
+    resources = ResourceCache()
+    resources.register_bundle()
+    app.setStyleSheet(resources.stylesheet("styles.qss"))
 
     window = MainWindow()
     window.show()
+
+    # Start loading pandas/sklearn/xgboost once the window has painted
+    QTimer.singleShot(0, start_background_loading)
+
+    if PREDICTION_CACHE_FILE:
+        app.aboutToQuit.connect(save_prediction_cache)
+
+    if IMPORT_TIMER:
+        QTimer.singleShot(0, lambda: IMPORT_TIMER.mark("main window shown"))
+        app.aboutToQuit.connect(IMPORT_TIMER.report)
+
     sys.exit(app.exec())
@@ -23,7 +23,11 @@ a = Analysis(
         'sklearn.random_projection', 'sklearn.svm', 'sklearn.tree', 
         'sklearn.utils', 'xgboost', 'xgboost.core', 'xgboost.compat', 
         'xgboost.training', 'xgboost.plotting', 'xgboost.callback', 
-        'xgboost.sklearn', 'pandas'
+        'xgboost.sklearn', 'pandas',
+        # Stage windows are imported lazily by main.py
+        'scripts.production', 'scripts.transportationFactory', 'scripts.manufacturing',
+        'scripts.transportationSite', 'scripts.construction', 'scripts.total',
+        'scripts.sweepWindow', 'scripts.bomWindow'
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,162 @@
+"""Pickle-free model artifacts.
+
+An artifact is a directory next to the pickle (models/Gradient-Boosting-A1/):
+
+    manifest.json       format version, stage, feature schema, category table,
+                        library versions and the SHA-256 of every file below
+    booster.ubj         the XGBoost booster in its native UBJSON format
+                        (booster.json on XGBoost releases without UBJSON)
+    preprocessing.npz   imputer means and one-hot categories as plain arrays
+
+verify() checks the manifest and checksums before anything is parsed, and
+loading never unpickles: the arrays are read with allow_pickle=False and the
+booster through XGBoost's own model loader. The trainer writes an artifact for
+every stage it trains; existing pickles are exported with
+
+    python -m scripts.artifact --check
+"""
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+PREPROCESSING_NAME = 'preprocessing.npz'
+
+class ArtifactError(ValueError):
+    pass
+
+def artifact_path(stage_name):
+    return os.path.splitext(STAGES[stage_name]['model_path'])[0]
+
+def manifest_path(stage_name):
+    return os.path.join(artifact_path(stage_name), MANIFEST_NAME)
+
+def artifact_exists(stage_name):
+    return os.path.exists(manifest_path(stage_name))
+
+def _digest(payload):
+    return hashlib.sha256(payload).hexdigest()
+
+def _booster_payload(booster):
+    try:
+        return 'booster.ubj', bytes(booster.save_raw(raw_format='ubj'))
+    except TypeError:
+        return 'booster.json', bytes(booster.save_raw(raw_format='json'))
+
+def save_artifact(stage_name, pipeline, directory=None):
+    """Write the artifact of a fitted stage pipeline; returns the manifest."""
+    import sklearn
+    import xgboost
+    from scripts.treeModel import extract_preprocessing
+
+    directory = directory or artifact_path(stage_name)
+    arrays, schema = extract_preprocessing(pipeline.named_steps['preprocessor'])
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    booster_name, booster_payload = _booster_payload(pipeline.named_steps['model'].get_booster())
+    files = {PREPROCESSING_NAME: buffer.getvalue(), booster_name: booster_payload}
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'stage': stage_name,
+        'code': STAGES[stage_name]['code'],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'schema': dict(schema, categories=arrays['categories'].tolist()),
+        'booster': booster_name,
+        'libraries': {'xgboost': xgboost.__version__, 'sklearn': sklearn.__version__},
+        'files': {name: {'sha256': _digest(payload), 'bytes': len(payload)} for name, payload in files.items()}
+    }
+
+    # Files first and the manifest last, so a reader never sees a manifest for missing files
+    os.makedirs(directory, exist_ok=True)
+    for name, payload in list(files.items()) + [(MANIFEST_NAME, json.dumps(manifest, indent=2).encode())]:
+        temporary_path = os.path.join(directory, f"{name}.tmp")
+        with open(temporary_path, 'wb') as file:
+            file.write(payload)
+        os.replace(temporary_path, os.path.join(directory, name))
+    return manifest
+
+def verify(directory, manifest_payload=None):
+    """Check the manifest and every file's checksum; returns (manifest, {name: bytes})."""
+    if manifest_payload is None:
+        with open(os.path.join(directory, MANIFEST_NAME), 'rb') as file:
+            manifest_payload = file.read()
+    try:
+        manifest = json.loads(manifest_payload)
+    except ValueError as e:
+        raise ArtifactError(f"Unreadable manifest in {directory}: {e}")
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format: {manifest.get('format_version')}")
+
+    files = {}
+    for name, expected in manifest['files'].items():
+        with open(os.path.join(directory, name), 'rb') as file:
+            payload = file.read()
+        if len(payload) != expected['bytes'] or _digest(payload) != expected['sha256']:
+            raise ArtifactError(f"Checksum mismatch for {name} in {directory}")
+        files[name] = payload
+    return manifest, files
+
+class ArtifactModel:
+    """Stage scorer built from a verified artifact: FeatureTransform + native XGBoost booster."""
+
+    def __init__(self, manifest, files):
+        import xgboost
+        from scripts.treeModel import FeatureTransform
+
+        self.manifest = manifest
+        with np.load(io.BytesIO(files[PREPROCESSING_NAME]), allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files}
+        self.transform = FeatureTransform(arrays, manifest['schema'])
+        self.booster = xgboost.Booster()
+        self.booster.load_model(bytearray(files[manifest['booster']]))
+        self.xgboost = xgboost
+
+    @classmethod
+    def load(cls, directory, manifest_payload=None):
+        return cls(*verify(directory, manifest_payload))
+
+    def predict(self, columns):
+        """Score a DataFrame or mapping of column -> values, like Pipeline.predict."""
+        X = self.transform(columns)
+        return self.booster.predict(self.xgboost.DMatrix(X, missing=np.nan))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the pickled stage pipelines as verifiable artifacts.")
+    parser.add_argument('stages', nargs='*', help="Stage names or codes (A1-A5); all stages by default")
+    parser.add_argument('--check', action='store_true', help="Compare against the pipeline on the training data")
+    parser.add_argument('--verify', action='store_true', help="Only verify the existing artifacts")
+    args = parser.parse_args(argv)
+
+    from scripts.modelRegistry import ModelRegistry
+
+    for stage_name in [resolve_stage(name) for name in args.stages] or STAGE_ORDER:
+        directory = artifact_path(stage_name)
+        if args.verify:
+            manifest, _ = verify(directory)
+            print(f"{directory}: ok ({', '.join(manifest['files'])})")
+            continue
+
+        pipeline = ModelRegistry().get_model(stage_name)
+        manifest = save_artifact(stage_name, pipeline)
+        size = sum(entry['bytes'] for entry in manifest['files'].values())
+        print(f"Exported {STAGES[stage_name]['model_path']} -> {directory} ({size} bytes)")
+
+        if args.check:
+            from scripts import datasets
+            from scripts.stages import feature_columns
+
+            frame = datasets.load(STAGES[stage_name]['data_path'], columns=feature_columns(stage_name))
+            difference = np.abs(pipeline.predict(frame) - ArtifactModel.load(directory).predict(frame))
+            print(f"  max abs difference {difference.max():.6f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Headless batch scoring of A1-A5 line items.
+
+Usage:
+    python -m scripts.batch data/A1-Production-Training.csv other.parquet \\
+        --output-dir predictions --totals project-totals.csv
+
+Each input file is scored with the model of the stage whose feature columns it
+contains (or the stage given with --stage). Line items are grouped by the
+--project-column; files without that column, and rows with a blank project
+cell, are assigned to --project.
+
+Files are streamed: --chunk-size rows are read, scored, appended to the output
+and added to the per-project totals at a time, so memory does not grow with
+the size of the input.
+"""
+import os
+import sys
+import argparse
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from scripts.modelRegistry import ModelRegistry
+from scripts.encoding import build_features
+from scripts.predictionCache import PredictionCache, cached_predict
+from scripts.formula import COMPILED, ANALYTIC, SCORING_MODES, scoring_mode
+from scripts.stages import STAGE_ORDER, detect_stage, resolve_stage, emission_level
+from scripts import telemetry
+
+PREDICTION_COLUMN = 'Predicted_emission'
+
+def read_table(path):
+    if path.lower().endswith(('.parquet', '.pq')):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def write_table(frame, path):
+    if path.lower().endswith(('.parquet', '.pq')):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+def table_columns(path):
+    """Column names of a CSV or Parquet file, read from its header or schema only."""
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    try:
+        return list(pd.read_csv(path, nrows=0).columns)
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"{path} is empty; expected a header row with the stage columns")
+
+def widened_schema(schema):
+    import pyarrow as pa
+    fields = []
+    for field in schema.remove_metadata():
+        if pa.types.is_integer(field.type):
+            field = field.with_type(pa.float64())
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+def output_schema(path, project_column):
+    """Schema of the scored output of a Parquet file: its own columns, the project and the prediction."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    fields = [field for field in pq.ParquetFile(path).schema_arrow.remove_metadata()
+              if field.name not in (project_column, PREDICTION_COLUMN)]
+    return pa.schema(fields + [pa.field(project_column, pa.string()), pa.field(PREDICTION_COLUMN, pa.float64())])
+
+def iter_table(path, chunk_size):
+    """Yield a CSV or Parquet file as frames of at most chunk_size rows."""
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+class TableWriter:
+    """Append frames to a CSV or Parquet file as they are produced.
+
+    Parquet output is written with schema when one is given. Otherwise the
+    schema is taken from the first frame, with integer columns widened to
+    float64 and all-null columns to string, because later chunks may hold
+    NaN or text there.
+    """
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.parquet = path.lower().endswith(('.parquet', '.pq'))
+        self.schema = schema
+        self.writer = None
+        self.started = False
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self.schema is None:
+                self.schema = widened_schema(pa.Schema.from_pandas(frame, preserve_index=False))
+            # Converting straight to the schema maps NaN to null, which a cast of float64 to int64 rejects
+            table = pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, self.schema)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self.started else 'w', header=not self.started, index=False)
+        self.started = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+class ProjectTotals:
+    """Running per-project, per-stage emission sums."""
+    def __init__(self):
+        self.sums = defaultdict(float)
+
+    def add(self, stage_name, projects, emissions):
+        grouped = pd.Series(np.asarray(emissions, dtype=float)).groupby(np.asarray(projects)).sum()
+        for project, emission in grouped.items():
+            self.sums[(project, stage_name)] += emission
+
+    def to_frame(self, project_column='Project'):
+        """One row per project with the stage columns, total and level, as the totals view shows them."""
+        long_frame = pd.DataFrame([(project, stage_name, emission)
+                                   for (project, stage_name), emission in self.sums.items()],
+                                  columns=[project_column, 'stage', 'emission'])
+        totals = long_frame.pivot_table(index=project_column, columns='stage', values='emission',
+                                        aggfunc='sum', fill_value=0.0)
+        totals = totals.reindex(columns=STAGE_ORDER, fill_value=0.0).fillna(0.0)
+        totals['total'] = totals[STAGE_ORDER].sum(axis=1)
+        totals['level'] = [emission_level(total / 1000)[0] for total in totals['total']]
+        totals.index.name = project_column
+        totals.columns.name = None
+        return totals.reset_index()
+
+def predict_frame(stage_name, frame, chunk_size=10000, compiled=False, use_cache=True, mode=None):
+    """Score every row of a frame with the stage model, chunk_size rows per predict call."""
+    mode = mode or (COMPILED if compiled else scoring_mode(stage_name))
+    model = ModelRegistry().get_scorer(stage_name, mode)
+    features = build_features(stage_name, frame)
+    if mode == ANALYTIC:
+        # The formula is vectorized over the whole frame; chunking and caching only add cost
+        return pd.Series(telemetry.predict(model, features, stage=stage_name), index=frame.index)
+    if use_cache:
+        predict = lambda chunk: cached_predict(stage_name, model, chunk, mode)
+    else:
+        predict = lambda chunk: telemetry.predict(model, chunk, stage=stage_name)
+    predictions = [
+        predict(features.iloc[start:start + chunk_size])
+        for start in range(0, len(features), chunk_size)
+    ]
+    values = np.concatenate(predictions) if predictions else np.array([], dtype=float)
+    return pd.Series(values, index=frame.index)
+
+def stream_file(path, output_path, totals, stage_name=None, project_column='Project', project='Project',
+                chunk_size=10000, compiled=False, use_cache=True, mode=None):
+    """Score a file chunk by chunk, appending to output_path and adding to totals; returns (stage, rows).
+
+    The stage is detected from the file's header, so a file without rows still
+    gets an output with just the header.
+    """
+    columns = table_columns(path)
+    stage_name = resolve_stage(stage_name) if stage_name else detect_stage(columns)
+    parquet_input = path.lower().endswith(('.parquet', '.pq'))
+    writer = TableWriter(output_path, output_schema(path, project_column) if parquet_input else None)
+    rows = 0
+    try:
+        for chunk in iter_table(path, chunk_size):
+            with telemetry.span('batch_chunk', stage=stage_name):
+                if project_column not in chunk.columns:
+                    chunk[project_column] = project
+                else:
+                    # Blank project cells would be dropped from the totals by groupby and pivot_table
+                    blank = chunk[project_column].isna() | (chunk[project_column].astype(str).str.strip() == '')
+                    chunk.loc[blank, project_column] = project
+                    chunk[project_column] = chunk[project_column].astype(str)
+                chunk[PREDICTION_COLUMN] = predict_frame(stage_name, chunk, chunk_size, compiled, use_cache, mode)
+                totals.add(stage_name, chunk[project_column], chunk[PREDICTION_COLUMN])
+            with telemetry.span('batch_write', stage=stage_name):
+                writer.write(chunk)
+            rows += len(chunk)
+        if not writer.started:
+            extra = [column for column in (project_column, PREDICTION_COLUMN) if column not in columns]
+            writer.write(pd.DataFrame(columns=columns + extra))
+    finally:
+        writer.close()
+    return stage_name, rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score bill-of-materials files through the stage models.")
+    parser.add_argument('inputs', nargs='+', help="CSV or Parquet files of stage line items")
+    parser.add_argument('--stage', help="Stage name or code (A1-A5); detected from the columns by default")
+    parser.add_argument('--project-column', default='Project', help="Column that identifies the project")
+    parser.add_argument('--project', default='Project', help="Project name for files without a project column")
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help="Rows read, scored and written at a time; bounds memory use")
+    parser.add_argument('--compiled', action='store_true',
+                        help="Use the NumPy tree models exported by scripts.treeModel")
+    parser.add_argument('--mode', choices=SCORING_MODES,
+                        help="Scoring mode for every stage; CARBON_SCORING_MODE or the stage default otherwise")
+    parser.add_argument('--no-cache', action='store_true', help="Do not memoize repeated line items")
+    parser.add_argument('--cache-file', help="Load and save the prediction cache from this JSON file")
+    parser.add_argument('--output-dir', default='predictions', help="Directory for the per-row predictions")
+    parser.add_argument('--totals', default='project-totals.csv', help="File for the per-project totals")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.cache_file:
+        PredictionCache().load(args.cache_file)
+
+    running_totals = ProjectTotals()
+    for path in args.inputs:
+        stem, extension = os.path.splitext(os.path.basename(path))
+        output_path = os.path.join(args.output_dir, f"{stem}-predictions{extension or '.csv'}")
+        stage_name, rows = stream_file(path, output_path, running_totals, args.stage, args.project_column,
+                                       args.project, args.chunk_size, args.compiled, not args.no_cache, args.mode)
+        print(f"Scored {rows} {stage_name} rows from {path} -> {output_path}")
+
+    totals = running_totals.to_frame(args.project_column)
+    write_table(totals, args.totals)
+    print(f"Wrote totals for {len(totals)} projects to {args.totals}")
+
+    if not args.no_cache:
+        stats = PredictionCache().stats()
+        print(f"Prediction cache: {stats['hits']} hits, {stats['misses']} misses")
+        if args.cache_file:
+            PredictionCache().save(args.cache_file)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Reproducible latency/throughput benchmark for the stage models.
+
+    python -m scripts.benchmark --output bench.json
+    python -m scripts.benchmark --baseline bench.json --threshold 0.2
+
+Measures model load time, single-row latency percentiles and batched
+throughput of every available scoring mode (as served by the model registry)
+and of the end-to-end predict_stage path, whole-project engine latency, peak RSS and MainWindow startup-to-first-paint
+under the offscreen Qt platform. With --baseline the run fails (exit code 1)
+when a metric is worse than the baseline by more than --threshold.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import argparse
+import subprocess
+import numpy as np
+from scripts import datasets
+from scripts.encoding import build_features
+from scripts.modelRegistry import ModelRegistry
+from scripts.predictionCache import PredictionCache, predict_stage
+from scripts.formula import MODEL, ARTIFACT, COMPILED, ANALYTIC
+from scripts.artifact import artifact_exists
+from scripts.stages import STAGES, STAGE_ORDER, feature_columns, resolve_stage
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+FIRST_PAINT_SCRIPT = """
+import os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.getcwd())
+import main
+from scripts.packages import QApplication, QTimer
+app = QApplication([])
+window = main.MainWindow()
+window.show()
+def painted():
+    print(time.perf_counter() - start)
+    app.quit()
+QTimer.singleShot(0, painted)
+app.exec()
+"""
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {f"p{q}_ms": float(np.percentile(samples, q)) for q in (50, 95, 99)}
+
+def sample_rows(stage_name, n_rows, seed=0):
+    """Deterministic rows drawn from the stage's training data."""
+    frame = datasets.load(STAGES[stage_name]['data_path'], columns=feature_columns(stage_name))
+    return frame.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+
+def time_load(path, loader, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with open(path, 'rb') as file:
+            loader(file.read())
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+def time_single_row(model, features, iterations, warmup=20, before=None):
+    """Latency percentiles of one-row predicts; before runs ahead of each call, outside the timing."""
+    rows = [features.iloc[[i % len(features)]] for i in range(iterations)]
+    for row in rows[:warmup]:
+        model.predict(row)
+    timings = []
+    for row in rows:
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - started)
+    return percentiles(timings)
+
+def time_batches(model, features, repeats, before=None):
+    results = {}
+    for batch_size in BATCH_SIZES:
+        batch = features.iloc[:batch_size]
+        model.predict(batch)
+        elapsed = 0.0
+        for _ in range(repeats):
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            model.predict(batch)
+            elapsed += time.perf_counter() - started
+        results[f"batch_{batch_size}_rows_per_s"] = batch_size * repeats / elapsed
+    return results
+
+class StagePredictor:
+    """predict_stage behind a predict method, so it is timed like the scorers."""
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+
+    def predict(self, features):
+        return predict_stage(self.stage_name, features)
+
+def available_modes(stage_name):
+    """Scoring modes whose files exist for the stage; the formula needs none."""
+    from scripts.treeModel import compiled_model_path
+    modes = [MODEL]
+    if artifact_exists(stage_name):
+        modes.append(ARTIFACT)
+    if os.path.exists(compiled_model_path(stage_name)):
+        modes.append(COMPILED)
+    modes.append(ANALYTIC)
+    return modes
+
+def time_predictions(model, features, iterations, repeats, prefix='', before=None):
+    results = {}
+    for name, value in time_single_row(model, features, iterations, before=before).items():
+        results[f"{prefix}single_row_{name}"] = value
+    for name, value in time_batches(model, features, repeats, before=before).items():
+        results[f"{prefix}{name}"] = value
+    return results
+
+def bench_stage(stage_name, iterations, repeats):
+    from scripts.treeModel import CompiledModel, compiled_model_path
+    from scripts.artifact import ArtifactModel, artifact_path, manifest_path
+
+    modes = available_modes(stage_name)
+    results = {}
+    results['load_pickle_ms'] = time_load(STAGES[stage_name]['model_path'], pickle.loads, repeats)
+    if ARTIFACT in modes:
+        directory = artifact_path(stage_name)
+        results['load_artifact_ms'] = time_load(manifest_path(stage_name),
+                                                lambda payload: ArtifactModel.load(directory, payload), repeats)
+    if COMPILED in modes:
+        results['load_compiled_ms'] = time_load(compiled_model_path(stage_name), CompiledModel.from_bytes, repeats)
+
+    features = build_features(stage_name, sample_rows(stage_name, max(BATCH_SIZES)))
+    for mode in modes:
+        # The pickled pipeline keeps the unprefixed metric names of earlier baselines
+        prefix = '' if mode == MODEL else f"{mode}_"
+        results.update(time_predictions(ModelRegistry().get_scorer(stage_name, mode), features,
+                                        iterations, repeats, prefix))
+
+    # The path the dialogs take: stage scoring mode, telemetry and the prediction cache.
+    # Cold clears the cache before every call, so a model or encoding regression shows;
+    # warm scores rows that are all cached, which is the cost of the cache itself.
+    predictor = StagePredictor(stage_name)
+    cache = PredictionCache()
+    results.update(time_predictions(predictor, features, iterations, repeats, 'predict_stage_cold_', cache.clear))
+    cache.clear()
+    predictor.predict(features)
+    results.update(time_predictions(predictor, features, iterations, repeats, 'predict_stage_warm_'))
+    return results
+
+def bench_project(iterations):
+    from scripts.engine import score_project
+
+    project = {stage_name: sample_rows(stage_name, 1, seed=1) for stage_name in STAGE_ORDER}
+    score_project(project, use_cache=False)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        score_project(project, use_cache=False)
+        timings.append(time.perf_counter() - started)
+    return {f"project_{name}": value for name, value in percentiles(timings).items()}
+
+def bench_first_paint(repeats):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    in_process, wall = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', FIRST_PAINT_SCRIPT], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        wall.append(time.perf_counter() - started)
+        in_process.append(float(output.strip().splitlines()[-1]))
+    return {
+        'first_paint_ms': float(np.median(in_process) * 1000),
+        'process_to_first_paint_ms': float(np.median(wall) * 1000)
+    }
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def higher_is_better(metric):
+    return metric.endswith('rows_per_s')
+
+def compare(results, baseline, threshold):
+    """Return a list of (metric, baseline, current) that regressed by more than threshold."""
+    regressions = []
+    for metric, current in results.items():
+        previous = baseline.get(metric)
+        if previous is None or current is None or previous == 0:
+            continue
+        if higher_is_better(metric):
+            worse = current < previous * (1 - threshold)
+        else:
+            worse = current > previous * (1 + threshold)
+        if worse:
+            regressions.append((metric, previous, current))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark stage model loading and prediction.")
+    parser.add_argument('stages', nargs='*', help="Stage names or codes (A1-A5); all stages by default")
+    parser.add_argument('--iterations', type=int, default=500, help="Single-row predictions per stage")
+    parser.add_argument('--repeats', type=int, default=5, help="Repeats for load and batch timings")
+    parser.add_argument('--skip-gui', action='store_true', help="Do not measure MainWindow first paint")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    np.random.seed(0)
+    stage_names = [resolve_stage(name) for name in args.stages] or STAGE_ORDER
+
+    results = {}
+    for stage_name in stage_names:
+        for metric, value in bench_stage(stage_name, args.iterations, args.repeats).items():
+            results[f"{stage_name}.{metric}"] = value
+    results.update(bench_project(args.iterations))
+    if not args.skip_gui:
+        results.update(bench_first_paint(args.repeats))
+    results['peak_rss_mb'] = peak_rss_mb()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': args.iterations,
+            'repeats': args.repeats
+        },
+        'results': results
+    }
+
+    for metric, value in results.items():
+        print(f"{metric:60s} {value if value is None else f'{value:12.3f}'}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for metric, previous, current in regressions:
+            print(f"REGRESSION {metric}: {previous:.3f} -> {current:.3f}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
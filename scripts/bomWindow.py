@@ -0,0 +1,395 @@
+import numpy as np
+import pandas as pd
+from scripts.packages import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QTableView,
+                              QHeaderView, QStyledItemDelegate, QComboBox, QFileDialog, QAbstractTableModel,
+                              QModelIndex, QTimer, QColor, Qt, Signal)
+from scripts.encoding import build_features, category_table
+from scripts.engine import default_executor, stage_frame
+from scripts.predictionCache import predict_stage
+from scripts.catalogue import Catalogue
+from scripts.catalogueSearch import CatalogueCompleter
+from scripts.data import PredictionStore
+from scripts.stages import STAGES, feature_columns, emission_level
+from scripts.worker import PredictionRunner, create_busy_indicator
+from scripts import telemetry
+
+EMISSION = 'Emission'
+# Edits closer together than this are scored as one batch
+RESCORE_DELAY_MS = 300
+ROWS_PER_TASK = 10000
+
+def score_rows(stage_name, columns):
+    """Predict {column: array} rows, split into chunks scored in parallel on the engine pool."""
+    size = len(next(iter(columns.values())))
+    if size == 0:
+        return np.array([], dtype=float)
+
+    def score_chunk(start):
+        features = build_features(stage_name, {column: values[start:start + ROWS_PER_TASK]
+                                               for column, values in columns.items()})
+        return np.asarray(predict_stage(stage_name, features), dtype=float)
+
+    return np.concatenate(list(default_executor().map(score_chunk, range(0, size, ROWS_PER_TASK))))
+
+class BomTableModel(QAbstractTableModel):
+    """Line items of one stage held column-wise in NumPy arrays.
+
+    Views only ask for the cells they show, so no per-cell widgets or Python
+    row objects exist. Edits mark their row dirty and adjust the column totals
+    by the difference; dirty rows are scored in one batch once editing pauses
+    for RESCORE_DELAY_MS, and the stage total is written to the PredictionStore.
+    """
+    totals_changed = Signal()
+
+    def __init__(self, stage_name, parent=None):
+        super().__init__(parent)
+        self.stage_name = stage_name
+        self.category_column = STAGES[stage_name]['categorical_feature']
+        self.numeric_columns = STAGES[stage_name]['numeric_features']
+        self.columns = feature_columns(stage_name) + [EMISSION]
+        self.size = 0
+        self.names = np.empty(0, dtype=object)
+        # Trained category each item is scored as (see scripts/catalogue.py)
+        self.categories = np.empty(0, dtype=object)
+        self.values = {column: np.empty(0, dtype=float) for column in self.numeric_columns + [EMISSION]}
+        self.totals = {column: 0.0 for column in self.numeric_columns + [EMISSION]}
+        self.dirty = set()
+        self.in_flight = np.empty(0, dtype=np.int64)
+
+        self.runner = PredictionRunner(self)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(RESCORE_DELAY_MS)
+        self.timer.timeout.connect(self.rescore)
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.size
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            column = self.columns[section]
+            return f"{EMISSION} (kgCO2e)" if column == EMISSION else column.replace('_', ' ')
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), self.columns[index.column()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == self.category_column:
+                return self.names[row]
+            value = self.values[column][row]
+            if np.isnan(value):
+                return ""
+            return f"{value:.2f}" if column == EMISSION else f"{value:g}"
+        if role == Qt.ForegroundRole and column == self.category_column and self.categories[row] is None:
+            return QColor(200, 0, 0)
+        if role == Qt.TextAlignmentRole and column != self.category_column:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and self.columns[index.column()] != EMISSION:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        row, column = index.row(), self.columns[index.column()]
+        if column == self.category_column:
+            self.set_item(row, str(value).strip())
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns) - 1))
+        else:
+            try:
+                number = float(value) if str(value).strip() else np.nan
+            except ValueError:
+                return False
+            self.set_value(column, row, number)
+            self.dataChanged.emit(index, index)
+        self.mark_dirty([row])
+        return True
+
+    # Editing
+
+    def set_value(self, column, row, value):
+        values = self.values[column]
+        self.totals[column] += np.nan_to_num(value) - np.nan_to_num(values[row])
+        values[row] = value
+
+    def set_item(self, row, name):
+        """Set a row's item and take its factors from the catalogue."""
+        item = Catalogue().lookup(self.stage_name, name) if name else None
+        self.names[row] = name
+        self.categories[row] = item.category if item is not None else None
+        if item is not None:
+            for column, factor in (('Fuel_consumption_rate', item.fuel_rate),
+                                   ('Carbon_emission_factor', item.carbon_factor)):
+                if column in self.values and factor is not None:
+                    self.set_value(column, row, factor)
+
+    def resize(self, size):
+        self.names = np.resize(self.names, size)
+        self.categories = np.resize(self.categories, size)
+        for column, values in self.values.items():
+            self.values[column] = np.resize(values, size)
+
+    def append_rows(self, count=1):
+        first = self.size
+        self.beginInsertRows(QModelIndex(), first, first + count - 1)
+        self.resize(first + count)
+        self.names[first:] = ''
+        self.categories[first:] = None
+        for values in self.values.values():
+            values[first:] = np.nan
+        self.size += count
+        self.endInsertRows()
+        self.totals_changed.emit()
+
+    def remove_rows(self, rows):
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if len(rows) == 0:
+            return
+        # Rows being scored are re-queued, since their positions are about to change
+        self.runner.cancel()
+        pending = self.pending_rows()
+        self.in_flight = np.empty(0, dtype=np.int64)
+
+        keep = np.ones(self.size, dtype=bool)
+        keep[rows] = False
+        new_positions = np.cumsum(keep) - 1
+        self.beginResetModel()
+        self.names = self.names[keep]
+        self.categories = self.categories[keep]
+        for column in self.values:
+            self.values[column] = self.values[column][keep]
+        self.size = int(keep.sum())
+        self.endResetModel()
+
+        self.dirty = {int(new_positions[row]) for row in pending if keep[row]}
+        self.recompute_totals()
+        self.schedule()
+
+    def load_frame(self, frame):
+        """Replace the rows with a frame holding the stage's feature columns."""
+        if self.category_column not in frame.columns:
+            raise ValueError(f"The table has no {self.category_column} column")
+        frame = stage_frame(self.stage_name, frame.reset_index(drop=True))
+        names = frame[self.category_column].astype(str).to_numpy(dtype=object)
+
+        self.runner.cancel()
+        self.beginResetModel()
+        self.size = len(frame)
+        self.names = names
+        self.categories = np.empty(self.size, dtype=object)
+        catalogue = Catalogue()
+        unique_names, inverse = np.unique(names, return_inverse=True)
+        items = [catalogue.lookup(self.stage_name, name) for name in unique_names]
+        self.categories[:] = np.array([item.category if item is not None else None for item in items],
+                                      dtype=object)[inverse]
+        for column in self.numeric_columns:
+            values = frame[column].to_numpy(dtype=float) if column in frame.columns else np.full(self.size, np.nan)
+            # Factors the stage tables do not know come from the catalogue
+            if column in ('Fuel_consumption_rate', 'Carbon_emission_factor'):
+                attribute = 'fuel_rate' if column == 'Fuel_consumption_rate' else 'carbon_factor'
+                factors = np.array([getattr(item, attribute) if item is not None and getattr(item, attribute) is not None
+                                    else np.nan for item in items], dtype=float)[inverse]
+                values = np.where(np.isnan(values), factors, values)
+            self.values[column] = values
+        self.values[EMISSION] = np.full(self.size, np.nan)
+        self.endResetModel()
+
+        self.in_flight = np.empty(0, dtype=np.int64)
+        self.dirty = set(range(self.size))
+        self.recompute_totals()
+        self.schedule()
+
+    def to_frame(self):
+        frame = pd.DataFrame({self.category_column: self.names[:self.size]})
+        for column in self.numeric_columns + [EMISSION]:
+            frame[column] = self.values[column][:self.size]
+        return frame
+
+    def recompute_totals(self):
+        for column, values in self.values.items():
+            self.totals[column] = float(np.nansum(values[:self.size]))
+        self.totals_changed.emit()
+
+    # Scoring
+
+    def pending_rows(self):
+        return self.dirty.union(self.in_flight.tolist())
+
+    def mark_dirty(self, rows):
+        self.dirty.update(rows)
+        self.totals_changed.emit()
+        self.schedule()
+
+    def schedule(self):
+        # Restarting the timer on every edit batches a burst of typing into one prediction
+        self.timer.start()
+
+    def scorable(self, rows):
+        """The rows with a known item and every numeric input filled in."""
+        complete = np.array([self.categories[row] is not None for row in rows], dtype=bool)
+        for column in self.numeric_columns:
+            complete &= ~np.isnan(self.values[column][rows])
+        return rows[complete], rows[~complete]
+
+    def rescore(self):
+        # A newer batch cancels the older one, so rows still being scored go into it as well
+        rows = np.array(sorted(self.pending_rows()), dtype=np.int64)
+        self.dirty = set()
+        if len(rows) == 0:
+            # Removing only scored rows, or loading an empty table, still changes the stage total
+            self.publish_total()
+            return
+        rows, incomplete = self.scorable(rows)
+        for row in incomplete:
+            self.set_value(EMISSION, row, np.nan)
+        if len(incomplete):
+            self.emit_emission_changed(incomplete)
+        self.in_flight = rows
+        if len(rows) == 0:
+            self.runner.cancel()
+            self.publish_total()
+            return
+
+        columns = {self.category_column: self.categories[rows].copy()}
+        for column in self.numeric_columns:
+            columns[column] = self.values[column][rows]
+        stage_name = self.stage_name
+        self.runner.submit(lambda: (rows, score_rows(stage_name, columns)), self.apply_scores, self.score_error)
+
+    def apply_scores(self, result):
+        with telemetry.span('ui_update', stage=f"{self.stage_name}-table"):
+            rows, predictions = result
+            self.in_flight = np.empty(0, dtype=np.int64)
+            # Rows edited again while they were being scored wait for their next batch
+            fresh = np.array([row not in self.dirty for row in rows], dtype=bool)
+            rows, predictions = rows[fresh], predictions[fresh]
+            emissions = self.values[EMISSION]
+            self.totals[EMISSION] += float(predictions.sum() - np.nansum(emissions[rows]))
+            emissions[rows] = predictions
+            self.emit_emission_changed(rows)
+            self.publish_total()
+
+    def score_error(self, message):
+        self.in_flight = np.empty(0, dtype=np.int64)
+        QMessageBox.critical(None, "Prediction Error", f"An error occurred while scoring the table: {message}")
+
+    def emit_emission_changed(self, rows):
+        if len(rows):
+            column = self.columns.index(EMISSION)
+            self.dataChanged.emit(self.index(int(rows.min()), column), self.index(int(rows.max()), column))
+
+    def publish_total(self):
+        self.totals_changed.emit()
+        PredictionStore().set_prediction(self.stage_name, self.totals[EMISSION])
+
+class CategoryDelegate(QStyledItemDelegate):
+    """Editable combo with catalogue completion for the category column."""
+    def __init__(self, stage_name, options, parent=None):
+        super().__init__(parent)
+        self.stage_name = stage_name
+        self.options = options
+
+    def createEditor(self, parent, option, index):
+        combo = QComboBox(parent)
+        combo.addItems(self.options)
+        combo.catalogue_completer = CatalogueCompleter(self.stage_name, combo)
+        return combo
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(Qt.EditRole) or '')
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), Qt.EditRole)
+
+class BomWindow(QDialog):
+    """Table editor for the line items of one stage."""
+    def __init__(self, stage_name, parent=None):
+        super().__init__(parent)
+        self.stage_name = stage_name
+        self.model = BomTableModel(stage_name, self)
+        self.setup_ui()
+        self.model.totals_changed.connect(self.update_totals)
+        self.model.runner.busy_changed.connect(self.busy_indicator.setVisible)
+        self.update_totals()
+
+    def setup_ui(self):
+        self.setWindowTitle(f"{STAGES[self.stage_name]['code']} Line Items")
+        self.resize(820, 600)
+        layout = QVBoxLayout(self)
+
+        buttons = QHBoxLayout()
+        for caption, slot in (('Add Row', self.add_row), ('Remove Rows', self.remove_rows),
+                              ('Import...', self.import_file), ('Export...', self.export_file)):
+            button = QPushButton(caption)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        buttons.addStretch(1)
+        layout.addLayout(buttons)
+
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        # Fixed row heights let the view place rows without measuring them
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        self.table.setItemDelegateForColumn(0, CategoryDelegate(
+            self.stage_name, list(category_table(self.stage_name).names), self.table))
+        layout.addWidget(self.table, 1)
+
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
+
+        self.totals_label = QLabel("", self)
+        self.totals_label.setWordWrap(True)
+        layout.addWidget(self.totals_label)
+
+    def update_totals(self):
+        model = self.model
+        total = model.totals[EMISSION]
+        level, _ = emission_level(total / 1000)
+        parts = [f"{column.replace('_', ' ')}: {model.totals[column]:g}" for column in model.numeric_columns]
+        pending = len(model.pending_rows())
+        self.totals_label.setText(
+            f"{model.size} rows" + (f" ({pending} to score)" if pending else "") + " | " + " | ".join(parts)
+            + f"<br>Total Carbon Emission: <b>{total:.2f} kgCO2e</b> - <b>{level}</b>")
+
+    def add_row(self):
+        self.model.append_rows(1)
+        self.table.scrollToBottom()
+        self.table.edit(self.model.index(self.model.size - 1, 0))
+
+    def remove_rows(self):
+        rows = [index.row() for index in self.table.selectionModel().selectedRows()]
+        self.model.remove_rows(rows)
+
+    def import_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Line Items", "", "Tables (*.csv *.parquet)")
+        if not path:
+            return
+        from scripts.batch import read_table
+        try:
+            self.model.load_frame(read_table(path))
+        except Exception as e:
+            QMessageBox.warning(self, "Import Error", f"Could not import {path}: {e}")
+
+    def export_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Line Items", "", "Tables (*.csv *.parquet)")
+        if not path:
+            return
+        from scripts.batch import write_table
+        try:
+            write_table(self.model.to_frame(), path)
+        except Exception as e:
+            QMessageBox.warning(self, "Export Error", f"Could not export {path}: {e}")
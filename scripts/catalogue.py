@@ -0,0 +1,313 @@
+"""Emission-factor catalogue in a local SQLite database.
+
+    python -m scripts.catalogue import factors.csv --stage A1
+    python -m scripts.catalogue search A3 "weld"
+    python -m scripts.catalogue lookup A1 Cement --region EU --year 2023
+
+Every item belongs to a stage and has a name, a region (GLOBAL when it is not
+regional), an optional year, a fuel consumption rate and a carbon factor. Its
+category is the stage option the model was trained on that the item is scored
+as, so catalogue items beyond the ten options per stage still go through the
+same pipelines. The database is created and seeded from the stage tables in
+scripts/encoding.py on first use; import CSV files (columns name, category,
+region, year, fuel_rate, carbon_factor) to add larger factor libraries. The
+category must be one of the stage's trained options (its dialog name or its
+training-data label); an import with any other category is rejected, since the
+model would silently score an unknown category as if it had none.
+
+Lookups prefer the requested region over GLOBAL and the latest year not after
+the requested one. Search matches name prefixes through the (stage,
+search_key) index and falls back to trigram matching for misspelt or
+mid-word queries. All SQL runs as cached prepared statements on one connection
+per thread, and lookup and search results are kept in an in-memory LRU.
+"""
+import os
+import sys
+import csv
+import sqlite3
+import difflib
+import argparse
+import threading
+from collections import OrderedDict, namedtuple
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage
+
+CATALOGUE_PATH = os.environ.get('CARBON_CATALOGUE', os.path.join('data', 'catalogue.sqlite'))
+REGION_VARIABLE = 'CARBON_REGION'
+GLOBAL_REGION = 'GLOBAL'
+SCHEMA_VERSION = 1
+HOT_CACHE_SIZE = 4096
+FUZZY_CANDIDATES = 5
+
+CatalogueItem = namedtuple('CatalogueItem', ['stage', 'name', 'category', 'region', 'year', 'fuel_rate', 'carbon_factor'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    search_key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    region TEXT NOT NULL DEFAULT 'GLOBAL',
+    year INTEGER NOT NULL DEFAULT 0,
+    fuel_rate REAL,
+    carbon_factor REAL,
+    UNIQUE (stage, search_key, region, year)
+);
+CREATE INDEX IF NOT EXISTS items_search ON items (stage, search_key);
+CREATE TABLE IF NOT EXISTS trigrams (
+    stage TEXT NOT NULL,
+    trigram TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (stage, trigram, name)
+) WITHOUT ROWID;
+"""
+
+_LOOKUP = """
+SELECT stage, name, category, region, year, fuel_rate, carbon_factor FROM items
+WHERE stage = ? AND search_key = ? AND region IN (?, 'GLOBAL') AND year <= ?
+ORDER BY region = 'GLOBAL', year DESC
+LIMIT 1
+"""
+
+_PREFIX = """
+SELECT MIN(name) FROM items
+WHERE stage = ? AND search_key >= ? AND search_key < ?
+GROUP BY search_key ORDER BY search_key
+LIMIT ?
+"""
+
+_INSERT = """
+INSERT OR REPLACE INTO items (stage, name, search_key, category, region, year, fuel_rate, carbon_factor)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_TRIGRAM = "INSERT OR IGNORE INTO trigrams (stage, trigram, name) VALUES (?, ?, ?)"
+
+# Undated items are stored as year 0 so that they sort before every dated variant
+UNDATED = 0
+# Upper bound for the year filter when no year is requested
+LATEST_YEAR = 9999
+
+def search_key(name):
+    return ' '.join(str(name).split()).casefold()
+
+def trigrams(text):
+    padded = f"  {search_key(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def seed_items():
+    """The options of the stage dialogs, as GLOBAL items without a year."""
+    from scripts.encoding import category_table
+    for stage_name in STAGE_ORDER:
+        table = category_table(stage_name)
+        for name, fuel_rate, carbon_factor in zip(table.names, table.fuel_rates, table.carbon_factors):
+            yield CatalogueItem(stage_name, name, name, GLOBAL_REGION, None,
+                                None if fuel_rate != fuel_rate else float(fuel_rate),
+                                None if carbon_factor != carbon_factor else float(carbon_factor))
+
+def trained_categories(stage_name):
+    """search_key -> dialog name of each option the stage model was trained on, by name and by label."""
+    from scripts.encoding import category_table
+    table = category_table(stage_name)
+    categories = {}
+    for name, label in zip(table.names, table.labels):
+        categories[search_key(label)] = name
+        categories[search_key(name)] = name
+    return categories
+
+def read_items(path, stage_name):
+    """CatalogueItems from a CSV file with name, category, region, year, fuel_rate and carbon_factor columns.
+
+    Without a category, the name itself has to be a trained option.
+    """
+    def number(value, kind=float):
+        return kind(value) if value not in (None, '') else None
+
+    with open(path, 'r', newline='') as file:
+        for row in csv.DictReader(file):
+            yield CatalogueItem(
+                stage_name,
+                row['name'].strip(),
+                (row.get('category') or row['name']).strip(),
+                (row.get('region') or GLOBAL_REGION).strip().upper(),
+                number(row.get('year'), int),
+                number(row.get('fuel_rate')),
+                number(row.get('carbon_factor'))
+            )
+
+class Catalogue:
+    """Process-wide access to the catalogue database."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(Catalogue, cls).__new__(cls)
+                cls._instance.open(CATALOGUE_PATH)
+        return cls._instance
+
+    def open(self, path):
+        self.path = path
+        self.region = os.environ.get(REGION_VARIABLE, GLOBAL_REGION).upper()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        self._ensure_database()
+
+    def connection(self):
+        # sqlite3 connections are bound to their thread; each keeps its own statement cache
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, cached_statements=64)
+        return connection
+
+    def _ensure_database(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self.connection()
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+        with connection:
+            connection.executescript(_SCHEMA)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.add(seed_items())
+
+    def add(self, items):
+        """Insert or replace items; returns how many were written.
+
+        Raises ValueError, writing nothing, if any item's category is not a
+        trained option of its stage.
+        """
+        rows, trigram_rows, invalid = [], [], []
+        categories = {}
+        for item in items:
+            if item.stage not in STAGES:
+                raise ValueError(f"Unknown stage: {item.stage}")
+            if item.stage not in categories:
+                categories[item.stage] = trained_categories(item.stage)
+            category = categories[item.stage].get(search_key(item.category))
+            if category is None:
+                invalid.append(item)
+                continue
+            rows.append((item.stage, item.name, search_key(item.name), category,
+                         item.region, item.year or UNDATED, item.fuel_rate, item.carbon_factor))
+            trigram_rows.extend((item.stage, trigram, item.name) for trigram in trigrams(item.name))
+
+        if invalid:
+            examples = ', '.join(f"{item.name!r} ({item.category!r})" for item in invalid[:5])
+            raise ValueError(f"{len(invalid)} items have no trained category of their stage, e.g. {examples}; "
+                             f"map each to one of the stage options in a category column")
+
+        connection = self.connection()
+        with connection:
+            connection.executemany(_INSERT, rows)
+            connection.executemany(_INSERT_TRIGRAM, trigram_rows)
+        with self._lock:
+            self._hot.clear()
+        return len(rows)
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._hot:
+                self._hot.move_to_end(key)
+                return self._hot[key]
+        value = compute()
+        with self._lock:
+            self._hot[key] = value
+            if len(self._hot) > HOT_CACHE_SIZE:
+                self._hot.popitem(last=False)
+        return value
+
+    def lookup(self, stage_name, name, region=None, year=None):
+        """The best matching item for name, or None when the catalogue does not know it."""
+        region = (region or self.region).upper()
+        key = ('lookup', stage_name, search_key(name), region, year)
+
+        def compute():
+            row = self.connection().execute(_LOOKUP, (stage_name, key[2], region, year or LATEST_YEAR)).fetchone()
+            if row is None:
+                return None
+            return CatalogueItem(*row[:4], row[4] or None, *row[5:])
+
+        return self._cached(key, compute)
+
+    def search(self, stage_name, text, limit=20):
+        """Item names starting with text, then fuzzy matches; at most limit distinct names."""
+        prefix = search_key(text)
+        return self._cached(('search', stage_name, prefix, limit), lambda: self._search(stage_name, prefix, limit))
+
+    def _search(self, stage_name, prefix, limit):
+        connection = self.connection()
+        # '\uffff' sorts after every character, so the range covers exactly the keys with this prefix
+        names = [row[0] for row in connection.execute(_PREFIX, (stage_name, prefix, prefix + '\uffff', limit))]
+        if len(names) >= limit or len(prefix) < 3:
+            return names
+
+        query = sorted(trigrams(prefix))
+        placeholders = ','.join('?' * len(query))
+        candidates = [row[0] for row in connection.execute(
+            f"SELECT name FROM trigrams WHERE stage = ? AND trigram IN ({placeholders}) "
+            f"GROUP BY name ORDER BY COUNT(*) DESC, LENGTH(name) LIMIT ?",
+            [stage_name, *query, limit * FUZZY_CANDIDATES])]
+        ranked = sorted(candidates, key=lambda name: -difflib.SequenceMatcher(None, prefix, search_key(name)).ratio())
+        seen = set(names)
+        for name in ranked:
+            if len(names) >= limit:
+                break
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+        return names
+
+    def count(self, stage_name=None):
+        if stage_name is None:
+            return self.connection().execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        return self.connection().execute("SELECT COUNT(*) FROM items WHERE stage = ?", (stage_name,)).fetchone()[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the emission-factor catalogue.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Add the items of CSV files to a stage")
+    import_parser.add_argument('files', nargs='+')
+    import_parser.add_argument('--stage', required=True, help="Stage name or code")
+
+    search_parser = commands.add_parser('search', help="Search item names of a stage")
+    search_parser.add_argument('stage')
+    search_parser.add_argument('text')
+    search_parser.add_argument('--limit', type=int, default=20)
+
+    lookup_parser = commands.add_parser('lookup', help="Show the factors of an item")
+    lookup_parser.add_argument('stage')
+    lookup_parser.add_argument('name')
+    lookup_parser.add_argument('--region')
+    lookup_parser.add_argument('--year', type=int)
+    args = parser.parse_args(argv)
+
+    catalogue = Catalogue()
+    stage_name = resolve_stage(args.stage)
+    if args.command == 'import':
+        for path in args.files:
+            try:
+                print(f"{path}: {catalogue.add(read_items(path, stage_name))} items")
+            except ValueError as e:
+                print(f"{path}: not imported: {e}")
+                return 1
+        print(f"{stage_name}: {catalogue.count(stage_name)} items in {catalogue.path}")
+    elif args.command == 'search':
+        for name in catalogue.search(stage_name, args.text, args.limit):
+            print(name)
+    else:
+        item = catalogue.lookup(stage_name, args.name, args.region, args.year)
+        if item is None:
+            print(f"{args.name} is not in the {stage_name} catalogue")
+            return 1
+        print(f"{item.name} ({item.region}{f', {item.year}' if item.year else ''}): category {item.category}, "
+              f"fuel rate {item.fuel_rate}, carbon factor {item.carbon_factor}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+from scripts.packages import QCompleter, QComboBox, QStringListModel, Qt
+from scripts.catalogue import Catalogue
+
+class CatalogueCompleter(QCompleter):
+    """Completer for a stage combo box, refilled from the catalogue as the user types.
+
+    The combo keeps its few default options; everything else in the catalogue
+    is reached through search, so large factor libraries never go through
+    addItems.
+    """
+    def __init__(self, stage_name, combo, limit=50):
+        super().__init__(combo)
+        self.stage_name = stage_name
+        self.limit = limit
+        self.names = QStringListModel(self)
+        self.setModel(self.names)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        # The catalogue already filtered (and fuzzy-matched) the names, so Qt must not filter them again
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+
+        combo.setEditable(True)
+        combo.setInsertPolicy(QComboBox.NoInsert)
+        combo.setCompleter(self)
+        combo.lineEdit().textEdited.connect(self.refresh)
+
+    def refresh(self, text):
+        if not text.strip():
+            self.names.setStringList([])
+            return
+        self.names.setStringList(Catalogue().search(self.stage_name, text, self.limit))
+        self.complete()
+
+def selected_item(stage_name, combo):
+    """Catalogue item named by the combo's text, or None."""
+    return Catalogue().lookup(stage_name, combo.currentText())
+
+def factor_text(value):
+    return f"{value:g}" if value is not None else ""
@@ -1,19 +1,27 @@
-from scripts.packages import pd, pickle, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
+from scripts.resources import ResourceCache
 from scripts.data import PredictionStore
+from scripts.predictionCache import predict_stage
+from scripts.encoding import category_table, build_features
+from scripts.worker import StageDialogMixin, create_busy_indicator
+from scripts.catalogueSearch import CatalogueCompleter, selected_item, factor_text
+from scripts import telemetry
 
-class ConstructionWindow(QDialog):
+class ConstructionWindow(StageDialogMixin, QDialog):
     def __init__(self):
         super().__init__()
+        self.machinery = category_table('construction')
+        self.sweep_window = None
         self.setup_ui()
-        self.model = self.load_model('models/Gradient-Boosting-A5.pkl')
-        self.machinery_factors = self.get_machinery_factors()
         self.update_factors()  # Set initial values based on default selection
 
+        self.start_runners('construction')
+
     def setup_ui(self):
         self.setWindowTitle("Construction Stage")
-        self.setWindowIcon(QIcon("resources/images/A5-favicon.png"))
-        self.setFixedSize(400, 520)
+        self.setWindowIcon(ResourceCache().icon("resources/images/A5-favicon.png"))
+        self.setFixedSize(400, 570)
 
         layout = QVBoxLayout(self)
 
@@ -29,6 +37,10 @@ class ConstructionWindow(QDialog):
         self.result_label = QLabel("", self)
         layout.addWidget(self.result_label)
 
+        # Busy indicator, shown while the model is predicting
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
+
     def create_text_edit(self, file_path):
         text_edit = QTextEdit(self)
         text_edit.setPlainText(load_text(file_path))
@@ -40,7 +52,8 @@ class ConstructionWindow(QDialog):
 
         # Machinery combo box
         self.machinery_combo = self.create_combo_box()
-        self.machinery_combo.currentIndexChanged.connect(self.update_factors)
+        self.machinery_completer = CatalogueCompleter('construction', self.machinery_combo)
+        self.machinery_combo.currentTextChanged.connect(self.update_factors)
 
         # Input fields
         self.quantity_input = self.create_input('Enter quantity')
@@ -56,15 +69,20 @@ class ConstructionWindow(QDialog):
         form_layout.addRow('Carbon Emission Factor:', self.carbon_factor_input)
 
         # Predict button
-        predict_button = QPushButton('Predict Total Carbon Emission')
-        predict_button.clicked.connect(self.predict)
-        form_layout.addRow(predict_button)
+        self.predict_button = QPushButton('Predict Total Carbon Emission')
+        self.predict_button.clicked.connect(self.predict)
+        form_layout.addRow(self.predict_button)
+
+        # What-if sweep over quantity and hours
+        self.sweep_button = QPushButton('What-if Sweep')
+        self.sweep_button.clicked.connect(self.open_sweep)
+        form_layout.addRow(self.sweep_button)
 
         return form_layout
 
     def create_combo_box(self):
         combo_box = QComboBox()
-        combo_box.addItems(self.get_machinery_list())
+        combo_box.addItems(list(self.machinery.names))
         return combo_box
 
     def create_input(self, placeholder_text, read_only=False):
@@ -73,82 +91,78 @@ class ConstructionWindow(QDialog):
         input_field.setReadOnly(read_only)
         return input_field
 
-    def load_model(self, model_path):
-        """Load the pickled model."""
-        try:
-            with open(model_path, 'rb') as file:
-                return pickle.load(file)
-        except (FileNotFoundError, pickle.UnpicklingError) as e:
-            QMessageBox.critical(self, "Model Error", f"Error loading model: {str(e)}")
-            return None
-
-    def get_machinery_list(self):
-        return [
-            'Air compressor', 'Bulldozer', 'Concrete mixer', 'Concrete pump',
-            'Crane', 'Crusher', 'Floor grinder', 'Power buggy', 'Road roller', 'Rock crusher'
-        ]
-
-    def get_machinery_factors(self):
-        return {
-            'Air compressor': (18, 1.6),
-            'Bulldozer': (20, 1.5),
-            'Concrete mixer': (18, 1.6),
-            'Concrete pump': (32, 2.3),
-            'Crane': (30, 2),
-            'Crusher': (50, 2.8),
-            'Floor grinder': (40, 2.5),
-            'Power buggy': (15, 1.4),
-            'Road roller': (25, 1.9),
-            'Rock crusher': (40, 2.5)
-        }
-
     def update_factors(self):
-        selected_machinery = self.machinery_combo.currentText()
-        fuel_consumption, carbon_factor = self.machinery_factors.get(selected_machinery, ("", ""))
-        self.fuel_consumption_input.setText(str(fuel_consumption))
-        self.carbon_factor_input.setText(str(carbon_factor))
+        item = selected_item('construction', self.machinery_combo)
+        if item is None:
+            self.fuel_consumption_input.setText("")
+            self.carbon_factor_input.setText("")
+            return
+        self.fuel_consumption_input.setText(factor_text(item.fuel_rate))
+        self.carbon_factor_input.setText(factor_text(item.carbon_factor))
 
     def predict(self):
         if not self.validate_inputs():
             return
 
-        features = self.prepare_features()
-        if self.model:
-            try:
-                prediction = self.model.predict(features)[0]
-                self.store_and_display_prediction(prediction)
-            except Exception as e:
-                QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {str(e)}")
-        else:
-            QMessageBox.critical(self, "Model Error", "Prediction model is not loaded.")
+        inputs = self.read_inputs()
+
+        def run_prediction():
+            features = self.prepare_features(inputs)
+            return predict_stage('construction', features)[0]
+
+        self.predictor.submit(run_prediction, self.store_and_display_prediction, self.show_prediction_error)
 
     def validate_inputs(self):
         """Validate user inputs."""
         try:
-            float(self.quantity_input.text())
-            float(self.hours_input.text())
-            return True
-        except ValueError:
-            QMessageBox.warning(self, "Input Error", "Quantity and Hours of Operation must be numeric.")
+            self.read_inputs()
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
             return False
+        return True
+
+    def read_inputs(self):
+        """Read the form on the GUI thread; the worker only sees plain values.
 
-    def prepare_features(self):
-        machinery_mapping = {mach: idx for idx, mach in enumerate(self.get_machinery_list())}
-        machinery_num = machinery_mapping[self.machinery_combo.currentText()]
-
-        features = pd.DataFrame({
-            'Machinery': [machinery_num],
-            'Quantity': [float(self.quantity_input.text())],
-            'Fuel_consumption_rate': [float(self.fuel_consumption_input.text())],
-            'Hours_of_operation': [float(self.hours_input.text())],
-            'Carbon_emission_factor': [float(self.carbon_factor_input.text())]
-        })
+        Raises ValueError with a message for the user when a field is invalid.
+        """
+        item = selected_item('construction', self.machinery_combo)
+        if item is None:
+            raise ValueError("Invalid machinery selected.")
+        try:
+            return {
+                'Machinery': item.category,
+                'Quantity': float(self.quantity_input.text()),
+                'Fuel_consumption_rate': float(self.fuel_consumption_input.text()),
+                'Hours_of_operation': float(self.hours_input.text()),
+                'Carbon_emission_factor': float(self.carbon_factor_input.text())
+            }
+        except ValueError:
+            raise ValueError("Quantity, Fuel Consumption Rate, Hours of Operation and Carbon Emission Factor "
+                             "must be numeric.")
+
+    def open_sweep(self):
+        if self.sweep_window is None:
+            from scripts.sweepWindow import SweepWindow
+            self.sweep_window = SweepWindow('construction', self.read_inputs, {
+                'Quantity': 'Quantity',
+                'Hours_of_operation': 'Hours of Operation',
+                'Fuel_consumption_rate': 'Fuel Consumption Rate'
+            }, self)
+        self.sweep_window.show()
+        self.sweep_window.raise_()
+
+    def prepare_features(self, inputs):
+        features = build_features('construction', inputs)
         return features
 
     def store_and_display_prediction(self, prediction):
-        self.predicted_emission = prediction
-        PredictionStore().set_prediction('construction', prediction)
-        self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
-
-    def get_prediction(self):
-        return getattr(self, 'predicted_emission', 0)
+        with telemetry.span('ui_update', stage='construction'):
+            self.predicted_emission = prediction
+            PredictionStore().set_prediction('construction', prediction)
+            self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
+
+    def clear_inputs(self):
+        self.machinery_combo.setCurrentIndex(0)
+        self.quantity_input.clear()
+        self.hours_input.clear()
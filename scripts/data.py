@@ -1,14 +1,107 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+DEFAULT_PROJECT = 'default'
+DEFAULT_SCENARIO = 'baseline'
+
+# Emitted to subscribers after every write; clear() emits one with stage_name None
+PredictionChange = namedtuple('PredictionChange', ['project', 'scenario', 'stage_name', 'old_value', 'new_value', 'version'])
+
+_EMPTY = MappingProxyType({})
+
 class PredictionStore:
+    """Stage predictions keyed by (project, scenario).
+
+    Writers are serialized by a lock. A write copies only the immutable stage
+    mapping of its (project, scenario) and swaps it in. snapshot() freezes the
+    outer mapping once per version, so it is a consistent view that readers can
+    hold on to while other threads keep writing.
+    """
     _instance = None
+    _instance_lock = threading.Lock()
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(PredictionStore, cls).__new__(cls)
-            cls._instance._data = {}
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(PredictionStore, cls).__new__(cls)
+                cls._instance._data = {}
+                cls._instance._snapshot = _EMPTY
+                cls._instance._lock = threading.RLock()
+                cls._instance._subscribers = []
+                cls._instance._version = 0
         return cls._instance
 
-    def set_prediction(self, stage_name, value):
-        self._data[stage_name] = value
+    def set_prediction(self, stage_name, value, project=DEFAULT_PROJECT, scenario=DEFAULT_SCENARIO):
+        key = (project, scenario)
+        with self._lock:
+            results = dict(self._data.get(key, _EMPTY))
+            old_value = results.get(stage_name, 0.0)
+            results[stage_name] = float(value)
+
+            self._data[key] = MappingProxyType(results)
+            self._snapshot = None
+            self._version += 1
+            event = PredictionChange(project, scenario, stage_name, old_value, float(value), self._version)
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            callback(event)
+
+    def get_prediction(self, stage_name, project=DEFAULT_PROJECT, scenario=DEFAULT_SCENARIO):
+        return self._data.get((project, scenario), _EMPTY).get(stage_name, 0.0)
+
+    def get_predictions(self, project=DEFAULT_PROJECT, scenario=DEFAULT_SCENARIO):
+        return self._data.get((project, scenario), _EMPTY)
+
+    def snapshot(self):
+        """Read-only view of every (project, scenario) -> {stage: value} at this moment."""
+        with self._lock:
+            # The stage mappings are immutable, so a shallow copy is consistent; it is reused until the next write
+            if self._snapshot is None:
+                self._snapshot = MappingProxyType(dict(self._data))
+            return self._snapshot
+
+    def versioned_snapshot(self):
+        """Return (version, snapshot) taken atomically, to match against PredictionChange.version."""
+        with self._lock:
+            return self._version, self.snapshot()
+
+    @property
+    def version(self):
+        return self._version
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self, project=None, scenario=None):
+        with self._lock:
+            if project is None:
+                self._data = {}
+            else:
+                for key in [key for key in self._data
+                            if key[0] == project and (scenario is None or key[1] == scenario)]:
+                    del self._data[key]
+            self._snapshot = None
+            self._version += 1
+            event = PredictionChange(project, scenario, None, None, None, self._version)
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            callback(event)
+
+    def subscribe(self, callback):
+        """Call callback(PredictionChange) after each write; returns a function that unsubscribes.
+
+        Callbacks run after the lock is released, so events of concurrent
+        writers can arrive out of order; compare versions per stage.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
 
-    def get_prediction(self, stage_name):
-        return self._data.get(stage_name, 0.0)
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
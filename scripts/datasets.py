@@ -0,0 +1,173 @@
+"""Columnar cache of the CSV and Excel datasets.
+
+    python -m scripts.datasets                 # convert data/*.csv and data/*.xlsx
+    python -m scripts.datasets --force
+    python -m scripts.datasets data/Draft-Dataset.xlsx --list
+
+Each source file is converted once into .cache/columnar/<name>-<path hash>/: one .npy file
+per column, with text columns stored as int32 codes whose categories live in
+manifest.json. A workbook keeps one table per sheet. The manifest records the
+source's SHA-256, so a source is converted again only when its content changes;
+an unchanged mtime and size skip even the hash.
+
+load() opens the columns as read-only memory maps, so only the pages that are
+actually used are read from disk.
+"""
+import os
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+DATA_DIR = 'data'
+COLUMNAR_DIR = os.path.join('.cache', 'columnar')
+FORMAT_VERSION = 1
+SOURCE_PATTERNS = ('*.csv', '*.xlsx')
+
+def source_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def cache_directory(path):
+    # The resolved path's hash keeps same-named files from different directories apart
+    location = hashlib.sha256(os.path.realpath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(COLUMNAR_DIR, f"{os.path.splitext(os.path.basename(path))[0]}-{location}")
+
+def read_source(path):
+    """Parse a source file into {table name: DataFrame}; one table per workbook sheet."""
+    if path.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(path, sheet_name=None)
+    return {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path)}
+
+def _write_table(frame, directory, table_index):
+    columns = []
+    for column_index, name in enumerate(frame.columns):
+        series = frame[name]
+        file_name = f"{table_index}-{column_index}.npy"
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            values = series.to_numpy()
+            column = {'name': str(name), 'file': file_name, 'kind': 'numeric', 'dtype': values.dtype.str}
+        else:
+            codes, categories = pd.factorize(series.astype(object), sort=True)
+            values = codes.astype(np.int32)
+            column = {'name': str(name), 'file': file_name, 'kind': 'categorical', 'dtype': values.dtype.str,
+                      'categories': [str(category) for category in categories]}
+        np.save(os.path.join(directory, file_name), np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(column)
+    return {'rows': int(len(frame)), 'columns': columns}
+
+def convert(path):
+    """Convert a source file into the columnar cache, replacing any previous conversion."""
+    directory = cache_directory(path)
+    temporary = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'source': path,
+        'sha256': source_hash(path),
+        'signature': _signature(path),
+        'tables': {}
+    }
+    for table_index, (table_name, frame) in enumerate(read_source(path).items()):
+        manifest['tables'][table_name] = _write_table(frame, temporary, table_index)
+    with open(os.path.join(temporary, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporary, directory)
+    return manifest
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(cache_directory(path), 'manifest.json'), 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+def _is_current(path, manifest):
+    if manifest is None or manifest.get('format') != FORMAT_VERSION:
+        return False
+    signature = _signature(path)
+    if manifest['signature'] == signature:
+        return True
+    if manifest['sha256'] != source_hash(path):
+        return False
+    # Touched but unchanged: remember the new signature so the hash is skipped next time
+    manifest['signature'] = signature
+    with open(os.path.join(cache_directory(path), 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return True
+
+def ensure(path, force=False):
+    """Return the manifest of an up-to-date conversion of path, converting it if needed."""
+    manifest = read_manifest(path)
+    if force or not _is_current(path, manifest):
+        manifest = convert(path)
+    return manifest
+
+def load_arrays(path, table=None, columns=None):
+    """Map a cached table's columns as read-only arrays; text columns come back as (codes, categories)."""
+    manifest = ensure(path)
+    table_name = table if table is not None else next(iter(manifest['tables']))
+    directory = cache_directory(path)
+    arrays = {}
+    for column in manifest['tables'][table_name]['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r', allow_pickle=False)
+        if column['kind'] == 'categorical':
+            values = (values, column['categories'])
+        arrays[column['name']] = values
+    return arrays
+
+def load(path, table=None, columns=None):
+    """Load a cached table as a DataFrame backed by the memory-mapped columns.
+
+    Text columns are pandas Categoricals built on the stored codes, so the
+    strings are not materialized per row.
+    """
+    data = {}
+    for name, values in load_arrays(path, table, columns).items():
+        if isinstance(values, tuple):
+            codes, categories = values
+            values = pd.Categorical.from_codes(codes, categories=categories)
+        data[name] = values
+    frame = pd.DataFrame(data, copy=False)
+    return frame[list(columns)] if columns is not None else frame
+
+def sources(data_dir=DATA_DIR):
+    return sorted(path for pattern in SOURCE_PATTERNS for path in glob.glob(os.path.join(data_dir, pattern)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the datasets into the columnar cache.")
+    parser.add_argument('paths', nargs='*', help="Source CSV/Excel files; everything in data/ by default")
+    parser.add_argument('--force', action='store_true', help="Convert even if the source is unchanged")
+    parser.add_argument('--list', action='store_true', help="Print the tables and columns of each source")
+    args = parser.parse_args(argv)
+
+    for path in args.paths or sources():
+        before = read_manifest(path)
+        manifest = ensure(path, args.force)
+        state = 'converted' if before is None or before['sha256'] != manifest['sha256'] or args.force else 'up to date'
+        print(f"{path}: {state} -> {cache_directory(path)}")
+        if args.list:
+            for table_name, table in manifest['tables'].items():
+                names = ", ".join(f"{column['name']} ({column['kind']})" for column in table['columns'])
+                print(f"  {table_name!r}: {table['rows']} rows; {names}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
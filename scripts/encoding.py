@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from scripts.stages import STAGES, STAGE_ORDER, feature_columns
+from scripts import telemetry
+
+# Options offered by the stage dialogs. 'labels' holds the spelling each option
+# has in the training data, which is what the pipelines' OneHotEncoder was fitted on.
+_STAGE_TABLES = {
+    'production': {
+        'names': ['Aluminium', 'Asphalt', 'Bricks', 'Cement', 'Concrete',
+                  'Glass', 'Plastics', 'Steel', 'Stone', 'Wood'],
+        'carbon_factors': [11.0, 0.1, 0.5, 0.9, 0.3, 0.8, 6.0, 1.8, 0.4, 0.2]
+    },
+    'transportation_to_factory': {
+        'names': ['Aluminium', 'Asphalt', 'Bricks', 'Cement', 'Concrete',
+                  'Glass', 'Plastics', 'Steel', 'Stone', 'Wood'],
+        'carbon_factors': [11.0, 0.1, 0.5, 0.9, 0.3, 0.8, 6.0, 1.8, 0.4, 0.2],
+        'fuel_rates': 0.4
+    },
+    'manufacturing': {
+        'names': ['Bending machine', 'Drill press', 'Electric furnace', 'Extruder', 'Forklift',
+                  'Generator', 'Hydraulic press', 'Laser cutter', 'Sandblaster', 'Welding machine'],
+        'labels': ['Bending Machine', 'Drill Press', 'Electric Furnace', 'Extruder', 'Forklift',
+                   'Generator', 'Hydraulic Press', 'Laser Cutter', 'Sandblaster', 'Welding Machine'],
+        'fuel_rates': [7, 2, 50, 25, 4, 10, 10, 8, 10, 15],
+        'carbon_factors': 0.5
+    },
+    'transportation_to_site': {
+        'names': ['AAC blocks', 'Aluminium studs', 'Cement board', 'Door frame', 'Duct tape',
+                  'Fiberboard', 'Metal siding', 'Resins', 'Stainless steel', 'Stone wool'],
+        'labels': ['AAC blocks', 'Aluminum studs', 'Cement board', 'Door Frame', 'Duct Tape',
+                   'Fiberboard', 'Metal siding', 'Resins', 'Stainless steel', 'Stone wool'],
+        'carbon_factors': [0.6, 11, 0.7, 0.6, 0.3, 0.6, 2.5, 7.5, 4, 3],
+        'fuel_rates': 0.4
+    },
+    'construction': {
+        'names': ['Air compressor', 'Bulldozer', 'Concrete mixer', 'Concrete pump', 'Crane',
+                  'Crusher', 'Floor grinder', 'Power buggy', 'Road roller', 'Rock crusher'],
+        'labels': [' Air Compressor', 'Bulldozer', 'Concrete Mixer', 'Concrete Pump', 'Crane',
+                   ' Crusher', 'Floor grinder', ' Power Buggy', ' Road Roller', 'Rock Crusher'],
+        'fuel_rates': [18, 20, 18, 32, 30, 50, 40, 15, 25, 40],
+        'carbon_factors': [1.6, 1.5, 1.6, 2.3, 2, 2.8, 2.5, 1.4, 1.9, 2.5]
+    }
+}
+
+class CategoryTable:
+    """Array-backed category -> code table for one stage, built once at import."""
+
+    def __init__(self, stage_name, names, labels=None, fuel_rates=None, carbon_factors=None):
+        self.stage_name = stage_name
+        self.column = STAGES[stage_name]['categorical_feature']
+        self.names = np.array(names, dtype=object)
+        self.labels = np.array(labels if labels is not None else names, dtype=object)
+        self.fuel_rates = self._as_array(fuel_rates)
+        self.carbon_factors = self._as_array(carbon_factors)
+        self.index = pd.Index(self.names)
+        self.codes = {name: code for code, name in enumerate(names)}
+
+    def _as_array(self, values):
+        if values is None:
+            return np.full(len(self.names), np.nan)
+        if np.isscalar(values):
+            return np.full(len(self.names), float(values))
+        return np.asarray(values, dtype=float)
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, name):
+        return self.codes.get(name, -1)
+
+STAGE_TABLES = {name: CategoryTable(name, **_STAGE_TABLES[name]) for name in STAGE_ORDER}
+
+def category_table(stage_name):
+    return STAGE_TABLES[stage_name]
+
+def encode(stage_name, values):
+    """Vectorized category name -> code lookup; unknown names map to -1."""
+    return STAGE_TABLES[stage_name].index.get_indexer(np.atleast_1d(np.asarray(values, dtype=object)))
+
+def model_labels(stage_name, values):
+    """Translate category names into the labels the pipeline was trained on.
+
+    Names that are not in the stage table are passed through unchanged, so raw
+    training-data categories (as found in batch input files) keep working.
+    """
+    table = STAGE_TABLES[stage_name]
+    values = np.atleast_1d(np.asarray(values, dtype=object))
+    codes = table.index.get_indexer(values)
+    return np.where(codes >= 0, table.labels[codes], values)
+
+def lookup_factors(stage_name, codes):
+    """Return (fuel_rates, carbon_factors) arrays for the given codes; -1 yields NaN."""
+    table = STAGE_TABLES[stage_name]
+    codes = np.atleast_1d(np.asarray(codes, dtype=np.int64))
+    valid = codes >= 0
+    safe_codes = np.where(valid, codes, 0)
+    fuel_rates = np.where(valid, table.fuel_rates[safe_codes], np.nan)
+    carbon_factors = np.where(valid, table.carbon_factors[safe_codes], np.nan)
+    return fuel_rates, carbon_factors
+
+def build_features(stage_name, columns):
+    """Build the model input frame from a mapping of feature column -> scalar or array.
+
+    The categorical column may hold dialog names or training labels; it is
+    translated with model_labels so the GUI and batch paths encode identically.
+    """
+    with telemetry.span('features', stage=stage_name):
+        category_column = STAGES[stage_name]['categorical_feature']
+        data = {}
+        for column in feature_columns(stage_name):
+            values = np.atleast_1d(np.asarray(columns[column]))
+            if column == category_column:
+                data[column] = model_labels(stage_name, values)
+            else:
+                data[column] = values.astype(float)
+        return pd.DataFrame(data)
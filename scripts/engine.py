@@ -0,0 +1,120 @@
+"""Score all five stages of a project in one call.
+
+A project maps stage names (or codes A1-A5) to its line items: a list of row
+dicts, a mapping of column -> values, or a DataFrame. Only the category and
+activity columns are required; fuel rates and carbon factors missing from the
+items are filled in from the stage tables.
+
+    python -m scripts.engine project.json
+"""
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scripts.encoding import build_features, encode, lookup_factors
+from scripts.modelRegistry import ModelRegistry
+from scripts.predictionCache import cached_predict
+from scripts.formula import COMPILED, ANALYTIC, SCORING_MODES, scoring_mode
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage, emission_level
+from scripts import telemetry
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def default_executor():
+    """Shared thread pool; XGBoost releases the GIL while predicting, so stages overlap."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(STAGE_ORDER), thread_name_prefix="stage-engine")
+        return _executor
+
+def stage_frame(stage_name, items):
+    """Turn a stage's line items into a frame, filling factor columns from the stage table."""
+    frame = items.copy() if isinstance(items, pd.DataFrame) else pd.DataFrame(items)
+    if frame.empty:
+        return frame
+    category_column = STAGES[stage_name]['categorical_feature']
+    codes = encode(stage_name, frame[category_column].to_numpy())
+    fuel_rates, carbon_factors = lookup_factors(stage_name, codes)
+    for column, defaults in (('Fuel_consumption_rate', fuel_rates), ('Carbon_emission_factor', carbon_factors)):
+        if column not in STAGES[stage_name]['numeric_features']:
+            continue
+        if column not in frame.columns:
+            frame[column] = defaults
+        else:
+            frame[column] = frame[column].astype(float).fillna(pd.Series(defaults, index=frame.index))
+    return frame
+
+def score_stage(stage_name, items, compiled=False, use_cache=True, mode=None):
+    """Score one stage's line items; returns the per-item predictions.
+
+    mode picks the scorer ('model', 'artifact', 'compiled' or 'analytic'); by
+    default it is 'compiled' when compiled is set and the stage's configured
+    mode otherwise.
+    """
+    with telemetry.span('score_stage', stage=stage_name):
+        frame = stage_frame(stage_name, items)
+        if frame.empty:
+            return np.array([], dtype=float)
+        mode = mode or (COMPILED if compiled else scoring_mode(stage_name))
+        model = ModelRegistry().get_scorer(stage_name, mode)
+        features = build_features(stage_name, frame)
+        if use_cache and mode != ANALYTIC:
+            return cached_predict(stage_name, model, features, mode)
+        return np.asarray(telemetry.predict(model, features, stage=stage_name), dtype=float)
+
+def score_project(project, executor=None, compiled=False, use_cache=True, mode=None):
+    """Score every stage of a project concurrently and band the results like the totals view."""
+    executor = executor or default_executor()
+    stage_items = {resolve_stage(name): items for name, items in project.items()}
+    futures = {
+        stage_name: executor.submit(score_stage, stage_name, items, compiled, use_cache, mode)
+        for stage_name, items in stage_items.items()
+    }
+
+    stages = {}
+    for stage_name in STAGE_ORDER:
+        items = futures[stage_name].result() if stage_name in futures else np.array([], dtype=float)
+        emission = float(items.sum())
+        stages[stage_name] = {
+            'emission': emission,
+            'level': emission_level(emission / 1000)[0],
+            'items': items
+        }
+
+    total = sum(stage['emission'] for stage in stages.values())
+    return {
+        'stages': stages,
+        'total': total,
+        'level': emission_level(total / 1000)[0]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score all stages of a project described in a JSON file.")
+    parser.add_argument('project', help="JSON object mapping stage names or codes to lists of line items")
+    parser.add_argument('--processes', action='store_true', help="Use a process pool instead of threads")
+    parser.add_argument('--compiled', action='store_true', help="Use the NumPy tree models")
+    parser.add_argument('--mode', choices=SCORING_MODES,
+                        help="Scoring mode for every stage; CARBON_SCORING_MODE or the stage default otherwise")
+    args = parser.parse_args(argv)
+
+    with open(args.project, 'r') as file:
+        project = json.load(file)
+
+    if args.processes:
+        with ProcessPoolExecutor(max_workers=len(STAGE_ORDER)) as executor:
+            result = score_project(project, executor, args.compiled, use_cache=False, mode=args.mode)
+    else:
+        result = score_project(project, compiled=args.compiled, mode=args.mode)
+
+    for stage_name, stage in result['stages'].items():
+        print(f"{STAGES[stage_name]['code']} {stage_name}: {stage['emission']:.2f} kgCO2e - {stage['level']}")
+    print(f"Total: {result['total']:.2f} kgCO2e - {result['level']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
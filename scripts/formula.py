@@ -0,0 +1,127 @@
+"""Closed-form scoring of the stages.
+
+Every stage model is trained on a target that is the product of its numeric
+inputs (scripts/stages.py 'target_product'), e.g. Mass_used *
+Carbon_emission_factor for A1. AnalyticModel computes that product directly,
+so a stage can be scored exactly and without loading a pipeline.
+
+The scoring mode of each stage is 'model' (pickled pipeline), 'artifact'
+(pickle-free export, see scripts/artifact.py), 'compiled' (NumPy tree model) or
+'analytic'. The default is 'artifact' when the stage has one and 'model'
+otherwise; CARBON_SCORING_MODE overrides it for all stages ('analytic') or per
+stage ('A1=analytic,A3=compiled').
+
+    python -m scripts.formula            # how far each model is from its formula
+    python -m scripts.formula A1 A2 --compiled --output deviation.csv
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage
+from scripts.artifact import artifact_exists
+
+MODEL = 'model'
+ARTIFACT = 'artifact'
+COMPILED = 'compiled'
+ANALYTIC = 'analytic'
+SCORING_MODES = (MODEL, ARTIFACT, COMPILED, ANALYTIC)
+
+SCORING_MODE_VARIABLE = 'CARBON_SCORING_MODE'
+
+class AnalyticModel:
+    """Drop-in for a stage pipeline: predict() returns the exact target formula.
+
+    Missing inputs give NaN rather than an imputed value, so gaps are not
+    silently turned into plausible emissions.
+    """
+    def __init__(self, stage_name):
+        self.stage_name = stage_name
+        self.columns = list(STAGES[stage_name]['target_product'])
+
+    def predict(self, features):
+        values = np.vstack([np.asarray(features[column], dtype=float) for column in self.columns])
+        return np.prod(values, axis=0)
+
+_analytic_models = {name: AnalyticModel(name) for name in STAGES}
+
+def analytic_model(stage_name):
+    return _analytic_models[stage_name]
+
+def parse_scoring_modes(value):
+    """'analytic' -> every stage; 'A1=analytic,A3=compiled' -> those stages."""
+    modes = {}
+    for part in filter(None, (part.strip() for part in (value or '').split(','))):
+        if '=' in part:
+            name, mode = (token.strip() for token in part.split('=', 1))
+            stage_names = [resolve_stage(name)]
+        else:
+            mode, stage_names = part, STAGE_ORDER
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        modes.update(dict.fromkeys(stage_names, mode))
+    return modes
+
+def default_mode(stage_name):
+    return ARTIFACT if artifact_exists(stage_name) else MODEL
+
+def scoring_mode(stage_name, default=None):
+    mode = parse_scoring_modes(os.environ.get(SCORING_MODE_VARIABLE)).get(stage_name, default)
+    return mode or default_mode(stage_name)
+
+def deviation(stage_name, compiled=False):
+    """Compare the stage model with its formula over the stage's training data."""
+    from scripts import datasets
+    from scripts.encoding import build_features
+    from scripts.modelRegistry import ModelRegistry
+
+    frame = datasets.load(STAGES[stage_name]['data_path'])
+    features = build_features(stage_name, frame)
+    model = ModelRegistry().get_scorer(stage_name, COMPILED if compiled else default_mode(stage_name))
+
+    expected = analytic_model(stage_name).predict(features)
+    predicted = np.asarray(model.predict(features), dtype=float)
+    error = predicted - expected
+    absolute = np.abs(error)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(expected != 0, absolute / np.abs(expected), np.nan)
+    residual = np.sum(error ** 2)
+    spread = np.sum((expected - expected.mean()) ** 2)
+
+    return {
+        'stage': stage_name,
+        'code': STAGES[stage_name]['code'],
+        'rows': int(len(frame)),
+        'mean_abs_error': float(absolute.mean()),
+        'max_abs_error': float(absolute.max()),
+        'rmse': float(np.sqrt(np.mean(error ** 2))),
+        'mean_rel_error': float(np.nanmean(relative)),
+        'p95_rel_error': float(np.nanpercentile(relative, 95)),
+        'r2': float(1 - residual / spread) if spread else float('nan'),
+        'total_model': float(predicted.sum()),
+        'total_formula': float(expected.sum())
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report how far the stage models deviate from the exact formula.")
+    parser.add_argument('stages', nargs='*', help="Stage names or codes (A1-A5); all stages by default")
+    parser.add_argument('--compiled', action='store_true', help="Check the NumPy tree models")
+    parser.add_argument('--output', help="Write the report as CSV to this file")
+    args = parser.parse_args(argv)
+
+    stage_names = [resolve_stage(name) for name in args.stages] or STAGE_ORDER
+    report = [deviation(stage_name, args.compiled) for stage_name in stage_names]
+
+    for row in report:
+        print(f"{row['code']} {row['stage']}: {row['rows']} rows, mean abs error {row['mean_abs_error']:.2f}, "
+              f"max {row['max_abs_error']:.2f}, mean rel error {row['mean_rel_error']:.2%}, "
+              f"p95 rel error {row['p95_rel_error']:.2%}, R2 {row['r2']:.4f}, "
+              f"total {row['total_model']:.2f} vs {row['total_formula']:.2f}")
+
+    if args.output:
+        import pandas as pd
+        pd.DataFrame(report).to_csv(args.output, index=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
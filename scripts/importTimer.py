@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import builtins
+import threading
+
+class ImportTimer:
+    """Record how long each module takes to import, like `python -X importtime`.
+
+    Enabled with the --import-times command line flag or CARBON_IMPORTTIME=1.
+    When disabled nothing is installed, so there is no overhead.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.marks = []
+        self.start = time.perf_counter()
+        self._original_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, argv):
+        if '--import-times' in argv or os.environ.get('CARBON_IMPORTTIME') == '1':
+            timer = cls()
+            timer.install()
+            return timer
+        return None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def mark(self, label):
+        """Record a named point in time relative to the timer start (e.g. first paint)."""
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                self_time, cumulative = self.timings.get(name, (0.0, 0.0))
+                self.timings[name] = (self_time + elapsed - children, cumulative + elapsed)
+
+    def report(self, limit=25, file=None):
+        file = file or sys.stderr
+        print("import time: self [ms] | cumulative [ms] | module", file=file)
+        rows = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_time, cumulative) in rows[:limit]:
+            print(f"import time: {self_time * 1000:9.1f} | {cumulative * 1000:15.1f} | {name}", file=file)
+        for label, elapsed in self.marks:
+            print(f"startup: {label} after {elapsed * 1000:.1f} ms", file=file)
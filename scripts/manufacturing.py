@@ -1,18 +1,27 @@
-from scripts.packages import pd, pickle, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
+from scripts.resources import ResourceCache
 from scripts.data import PredictionStore
+from scripts.predictionCache import predict_stage
+from scripts.encoding import category_table, build_features
+from scripts.worker import StageDialogMixin, create_busy_indicator
+from scripts.catalogueSearch import CatalogueCompleter, selected_item, factor_text
+from scripts import telemetry
 
-class ManufacturingWindow(QDialog):
+class ManufacturingWindow(StageDialogMixin, QDialog):
     def __init__(self):
         super().__init__()
-        self.model = self.load_model()
+        self.equipment_types = category_table('manufacturing')
+        self.sweep_window = None
         self.setup_ui()
         self.update_fuel_consumption()
 
+        self.start_runners('manufacturing')
+
     def setup_ui(self):
         self.setWindowTitle("Manufacturing Stage")
-        self.setWindowIcon(QIcon("resources/images/A3-favicon.png"))
-        self.setFixedSize(400, 520)
+        self.setWindowIcon(ResourceCache().icon("resources/images/A3-favicon.png"))
+        self.setFixedSize(400, 570)
 
         layout = QVBoxLayout(self)
 
@@ -28,6 +37,10 @@ class ManufacturingWindow(QDialog):
         self.result_label = QLabel("", self)
         layout.addWidget(self.result_label)
 
+        # Add busy indicator, shown while the model is predicting
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
+
     def create_text_edit(self, file_path):
         text_edit = QTextEdit(self)
         text_edit.setPlainText(load_text(file_path))
@@ -39,7 +52,8 @@ class ManufacturingWindow(QDialog):
 
         # Equipment selection
         self.equipment_combo = self.create_combo_box()
-        self.equipment_combo.currentIndexChanged.connect(self.update_fuel_consumption)
+        self.equipment_completer = CatalogueCompleter('manufacturing', self.equipment_combo)
+        self.equipment_combo.currentTextChanged.connect(self.update_fuel_consumption)
 
         # Quantity input
         self.quantity_input = self.create_input('Enter quantity')
@@ -50,9 +64,9 @@ class ManufacturingWindow(QDialog):
         # Hours input
         self.hours_input = self.create_input('Enter hours of operation')
 
-        # Carbon factor input (read-only), default value set to 0.5
+        # Carbon factor input (read-only), same factor for all equipment
         self.carbon_factor_input = self.create_input(read_only=True)
-        self.carbon_factor_input.setText('0.5')  # Set default value
+        self.carbon_factor_input.setText(f"{self.equipment_types.carbon_factors[0]:g}")
 
         # Add widgets to form layout
         form_layout.addRow('Manufacturing Equipment:', self.equipment_combo)
@@ -62,9 +76,14 @@ class ManufacturingWindow(QDialog):
         form_layout.addRow('Carbon Emission Factor:', self.carbon_factor_input)
 
         # Predict button
-        predict_button = QPushButton('Predict Total Carbon Emission')
-        predict_button.clicked.connect(self.predict)
-        form_layout.addRow(predict_button)
+        self.predict_button = QPushButton('Predict Total Carbon Emission')
+        self.predict_button.clicked.connect(self.predict)
+        form_layout.addRow(self.predict_button)
+
+        # What-if sweep over quantity and hours
+        self.sweep_button = QPushButton('What-if Sweep')
+        self.sweep_button.clicked.connect(self.open_sweep)
+        form_layout.addRow(self.sweep_button)
 
         return form_layout
 
@@ -76,58 +95,42 @@ class ManufacturingWindow(QDialog):
 
     def create_combo_box(self):
         combo_box = QComboBox()
-        equipment_types = {
-            'Bending machine': 7,
-            'Drill press': 2,
-            'Electric furnace': 50,
-            'Extruder': 25,
-            'Forklift': 4,
-            'Generator': 10,
-            'Hydraulic press': 10,
-            'Laser cutter': 8,
-            'Sandblaster': 10,
-            'Welding machine': 15
-        }
-        combo_box.addItems(equipment_types.keys())
-        self.equipment_types = equipment_types
+        combo_box.addItems(list(self.equipment_types.names))
         return combo_box
 
-    def load_model(self):
-        try:
-            with open('models/Gradient-Boosting-A3.pkl', 'rb') as file:
-                return pickle.load(file)
-        except (FileNotFoundError, pickle.UnpicklingError) as e:
-            QMessageBox.critical(self, "Model Error", f"Error loading model: {str(e)}")
-            return None
-
     def update_fuel_consumption(self):
-        selected_equipment = self.equipment_combo.currentText()
-        fuel_consumption = self.equipment_types.get(selected_equipment, "")
-        self.fuel_consumption_input.setText(str(fuel_consumption))
+        item = selected_item('manufacturing', self.equipment_combo)
+        if item is None:
+            self.fuel_consumption_input.setText("")
+            return
+        self.fuel_consumption_input.setText(factor_text(item.fuel_rate))
+        if item.carbon_factor is not None:
+            self.carbon_factor_input.setText(factor_text(item.carbon_factor))
 
     def predict(self):
         try:
             quantity, fuel_consumption, hours, carbon_factor = self.get_numeric_inputs()
-            equipment_num = self.get_equipment_num()
-
-            features = pd.DataFrame({
-                'Manufacturing_equipment': [equipment_num],
-                'Quantity': [quantity],
-                'Fuel_consumption_rate': [fuel_consumption],
-                'Hours_of_operation': [hours],
-                'Carbon_emission_factor': [carbon_factor]
-            })
-
-            if self.model:
-                prediction = self.model.predict(features)[0]
-                self.store_prediction(prediction)
-                self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
-            else:
-                QMessageBox.critical(self, "Model Error", "Prediction model is not loaded.")
+            equipment = self.get_equipment()
         except ValueError as e:
             QMessageBox.warning(self, "Input Error", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {str(e)}")
+            return
+
+        def run_prediction():
+            features = build_features('manufacturing', {
+                'Manufacturing_equipment': equipment,
+                'Quantity': quantity,
+                'Fuel_consumption_rate': fuel_consumption,
+                'Hours_of_operation': hours,
+                'Carbon_emission_factor': carbon_factor
+            })
+            return predict_stage('manufacturing', features)[0]
+
+        self.predictor.submit(run_prediction, self.show_prediction, self.show_prediction_error)
+
+    def show_prediction(self, prediction):
+        with telemetry.span('ui_update', stage='manufacturing'):
+            self.store_prediction(prediction)
+            self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
 
     def get_numeric_inputs(self):
         try:
@@ -139,17 +142,39 @@ class ManufacturingWindow(QDialog):
         except ValueError:
             raise ValueError("Quantity, Fuel Consumption, Hours of Operation, and Carbon Emission Factor must be numeric.")
 
-    def get_equipment_num(self):
-        equipment_mapping = {equip: idx for idx, equip in enumerate(self.equipment_types.keys())}
-        equipment_num = equipment_mapping.get(self.equipment_combo.currentText(), -1)
-        if equipment_num == -1:
+    def get_equipment(self):
+        item = selected_item('manufacturing', self.equipment_combo)
+        if item is None:
             raise ValueError("Invalid equipment type selected.")
-        return equipment_num
+        return item.category
+
+    def read_inputs(self):
+        quantity, fuel_consumption, hours, carbon_factor = self.get_numeric_inputs()
+        return {
+            'Manufacturing_equipment': self.get_equipment(),
+            'Quantity': quantity,
+            'Fuel_consumption_rate': fuel_consumption,
+            'Hours_of_operation': hours,
+            'Carbon_emission_factor': carbon_factor
+        }
+
+    def open_sweep(self):
+        if self.sweep_window is None:
+            from scripts.sweepWindow import SweepWindow
+            self.sweep_window = SweepWindow('manufacturing', self.read_inputs, {
+                'Quantity': 'Quantity',
+                'Hours_of_operation': 'Hours of Operation',
+                'Fuel_consumption_rate': 'Fuel Consumption Rate'
+            }, self)
+        self.sweep_window.show()
+        self.sweep_window.raise_()
 
     def store_prediction(self, prediction):
         store = PredictionStore()
         store.set_prediction('manufacturing', prediction)
         self.predicted_emission = prediction
 
-    def get_prediction(self):
-        return getattr(self, 'predicted_emission', 0)
+    def clear_inputs(self):
+        self.equipment_combo.setCurrentIndex(0)
+        self.quantity_input.clear()
+        self.hours_input.clear()
@@ -0,0 +1,129 @@
+import os
+import pickle
+import hashlib
+import threading
+from scripts.stages import STAGES
+from scripts import telemetry
+
+MODEL_PATHS = {name: stage['model_path'] for name, stage in STAGES.items()}
+
+class ModelRegistry:
+    """Process-wide cache of the unpickled stage pipelines.
+
+    Each model is loaded once and kept for the life of the process. On every
+    lookup the file's mtime and size are checked; if they changed, the content
+    hash decides whether the pipeline really has to be unpickled again.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ModelRegistry, cls).__new__(cls)
+                cls._instance._entries = {}
+                cls._instance._locks = {}
+                cls._instance._locks_guard = threading.Lock()
+        return cls._instance
+
+    def get_model(self, stage_name):
+        return self._get(stage_name, MODEL_PATHS[stage_name], pickle.loads)
+
+    def get_compiled_model(self, stage_name):
+        """Return the NumPy tree model exported by `python -m scripts.treeModel`."""
+        from scripts.treeModel import CompiledModel, compiled_model_path
+        return self._get(('compiled', stage_name), compiled_model_path(stage_name), CompiledModel.from_bytes)
+
+    def get_artifact_model(self, stage_name):
+        """Return the verified pickle-free artifact written by the trainer or `python -m scripts.artifact`."""
+        from scripts.artifact import ArtifactModel, artifact_path, manifest_path
+        directory = artifact_path(stage_name)
+        return self._get(('artifact', stage_name), manifest_path(stage_name),
+                         lambda payload: ArtifactModel.load(directory, payload))
+
+    def get_scorer(self, stage_name, mode=None):
+        """Model for the stage's scoring mode (see scripts/formula.py)."""
+        from scripts.formula import COMPILED, ANALYTIC, ARTIFACT, analytic_model, scoring_mode
+        mode = mode or scoring_mode(stage_name)
+        if mode == ANALYTIC:
+            return analytic_model(stage_name)
+        if mode == COMPILED:
+            return self.get_compiled_model(stage_name)
+        if mode == ARTIFACT:
+            return self.get_artifact_model(stage_name)
+        return self.get_model(stage_name)
+
+    def _get(self, key, path, loader):
+        with self._stage_lock(key):
+            signature = self._signature(path)
+            entry = self._entries.get(key)
+            if entry is not None and entry['signature'] == signature:
+                return entry['model']
+
+            with open(path, 'rb') as file:
+                payload = file.read()
+            digest = hashlib.sha256(payload).hexdigest()
+
+            # Touched but unchanged files keep the already loaded model
+            if entry is not None and entry['digest'] == digest:
+                entry['signature'] = signature
+                return entry['model']
+
+            kind, stage_name = key if isinstance(key, tuple) else ('model', key)
+            with telemetry.span('model_load', stage=stage_name, kind=kind):
+                model = loader(payload)
+            self._entries[key] = {
+                'model': model,
+                'signature': signature,
+                'digest': digest
+            }
+            return model
+
+    def model_version(self, stage_name, mode='model'):
+        """Content hash of the loaded model file, used to key cached predictions."""
+        key = stage_name if mode == 'model' else (mode, stage_name)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.get_scorer(stage_name, mode)
+            entry = self._entries[key]
+        return entry['digest'][:16]
+
+    def is_loaded(self, stage_name):
+        """Whether any form of the stage model (pickle, artifact, compiled) is loaded."""
+        return any(key == stage_name or (isinstance(key, tuple) and key[1] == stage_name) for key in self._entries)
+
+    def unload(self, stage_name=None):
+        if stage_name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(stage_name, None)
+            self._entries.pop(('compiled', stage_name), None)
+            self._entries.pop(('artifact', stage_name), None)
+
+    def warm_up(self, stage_names=None, mode=None):
+        """Load the scorers of the given stages (all by default) in a background thread.
+
+        mode is passed to get_scorer, so the stage's configured mode is loaded unless one is given.
+        """
+        stage_names = list(stage_names or MODEL_PATHS.keys())
+
+        def load_all():
+            for stage_name in stage_names:
+                try:
+                    self.get_scorer(stage_name, mode)
+                except Exception as e:
+                    # The dialog reports the error when the stage is opened
+                    print(f"Error warming model for {stage_name}: {e}")
+
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _stage_lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,258 @@
+"""Search for the lowest-emission substitutions in a project.
+
+    python -m scripts.optimizer project.json --top 5
+
+The project has the same format as for scripts/engine.py. An optional
+"substitutions" object limits the alternatives per stage and category, e.g.
+{"A1": {"Cement": ["Concrete", "Bricks"]}}; otherwise every option of the
+stage table may replace a line item's material, equipment or machinery, with
+its fuel rate and carbon factor taken from the table.
+
+Line items are independent except that A1 and A2 items with the same raw
+material form one decision: substituting a material changes both its
+production and its transport. Because the project total is a sum over these
+decisions, the k lowest totals are found exactly by a heap merge of each
+decision's sorted candidate costs, without enumerating the product space.
+
+Before the models run, every candidate is estimated with the closed-form
+formula of its emission factors (scripts/formula.py). Assuming each model
+prediction lies within --tolerance (relative) of its formula value, a candidate
+is pruned when even its lowest possible total is above the k-th lowest highest
+possible total, so it cannot be in the top k. The pruning is only as exact as
+that assumption: a model that deviates further from the formula can lose a
+candidate. Decisions with an item the formula cannot estimate (no factor for
+its category) are never pruned. The rest are scored in one batch per stage,
+with the stages in parallel, through the shared prediction cache. Items may
+name their category by its dialog name or its training-data label.
+"""
+import sys
+import json
+import heapq
+import argparse
+import numpy as np
+import pandas as pd
+from scripts.engine import default_executor, stage_frame, score_stage
+from scripts.encoding import build_features, category_table, encode, lookup_factors
+from scripts.formula import ANALYTIC, SCORING_MODES, analytic_model, scoring_mode
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage, emission_level
+
+COUPLED_STAGES = ('production', 'transportation_to_factory')
+FACTOR_COLUMNS = ('Fuel_consumption_rate', 'Carbon_emission_factor')
+
+def table_names(stage_name, values):
+    """Category values with training-data labels replaced by the stage table's names."""
+    table = category_table(stage_name)
+    names = dict(zip(table.labels, table.names))
+    return [names.get(value, value) for value in values]
+
+def stage_items(stage_name, items):
+    """A stage's items as a frame with table names and factors filled in (see scripts/engine.py)."""
+    frame = items.copy() if isinstance(items, pd.DataFrame) else pd.DataFrame(items)
+    column = STAGES[stage_name]['categorical_feature']
+    if column in frame.columns:
+        # Labels must become names first, or the factor lookup would not find them
+        frame[column] = table_names(stage_name, frame[column])
+    return stage_frame(stage_name, frame)
+
+def build_decisions(frames, substitutions):
+    """Group line items into decisions: [{'current', 'candidates', 'members': [(stage, row)]}]."""
+    decisions, coupled = [], {}
+    for stage_name in STAGE_ORDER:
+        frame = frames.get(stage_name)
+        if frame is None or frame.empty:
+            continue
+        table = category_table(stage_name)
+        allowed = substitutions.get(stage_name, {})
+        for row, name in enumerate(table_names(stage_name, frame[table.column])):
+            if table.code(name) == -1:
+                candidates = [name]
+            else:
+                candidates = [candidate for candidate in allowed.get(name, table.names) if table.code(candidate) != -1]
+                candidates = [name] + [candidate for candidate in candidates if candidate != name]
+
+            if stage_name in COUPLED_STAGES:
+                decision = coupled.get(name)
+                if decision is not None:
+                    decision['candidates'] = [c for c in decision['candidates'] if c in candidates]
+                    decision['members'].append((stage_name, row))
+                    continue
+            decision = {'current': name, 'candidates': candidates, 'members': [(stage_name, row)]}
+            if stage_name in COUPLED_STAGES:
+                coupled[name] = decision
+            decisions.append(decision)
+    return decisions
+
+def expand(stage_name, frame, decisions):
+    """One row per (member item, candidate) of a stage; returns (frame, [(decision, candidate)])."""
+    rows, candidates, substituted, keys = [], [], [], []
+    for index, decision in enumerate(decisions):
+        for member_stage, row in decision['members']:
+            if member_stage != stage_name:
+                continue
+            for candidate in decision['candidates']:
+                rows.append(row)
+                candidates.append(candidate)
+                substituted.append(candidate != decision['current'])
+                keys.append((index, candidate))
+
+    expanded = frame.iloc[rows].reset_index(drop=True)
+    candidates = np.array(candidates, dtype=object)
+    substituted = np.array(substituted, dtype=bool)
+    expanded[STAGES[stage_name]['categorical_feature']] = candidates
+    # Substituted items take the table factors of their new category; kept items keep their own
+    for column, factors in zip(FACTOR_COLUMNS, lookup_factors(stage_name, encode(stage_name, candidates))):
+        if column in expanded.columns:
+            replace = substituted & ~np.isnan(factors)
+            expanded[column] = np.where(replace, factors, expanded[column].to_numpy(dtype=float))
+    return expanded, keys
+
+def decision_costs(keys, predictions, costs):
+    for (index, candidate), prediction in zip(keys, predictions):
+        costs[index][candidate] = costs[index].get(candidate, 0.0) + float(prediction)
+
+def k_smallest_sums(costs, k):
+    """The k lowest totals picking one candidate per decision; returns [(total, choices)]."""
+    ordered = [sorted(decision.items(), key=lambda item: item[1]) for decision in costs]
+    start = (0,) * len(ordered)
+    heap = [(sum(options[0][1] for options in ordered), start)]
+    seen = {start}
+    results = []
+    while heap and len(results) < k:
+        total, indices = heapq.heappop(heap)
+        results.append((total, [ordered[d][i][0] for d, i in enumerate(indices)]))
+        for d, i in enumerate(indices):
+            if i + 1 < len(ordered[d]):
+                following = indices[:d] + (i + 1,) + indices[d + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (total - ordered[d][i][1] + ordered[d][i + 1][1], following))
+    return results
+
+def prune(decisions, estimates, k, tolerance):
+    """Drop candidates that cannot reach the k lowest totals if the models stay within tolerance of the formula.
+
+    Returns (pruned candidates, decisions left unbounded because an estimate is NaN).
+    """
+    bounded = [index for index, costs in enumerate(estimates)
+               if not any(np.isnan(cost) for cost in costs.values())]
+    low = {index: {candidate: cost - tolerance * abs(cost) for candidate, cost in estimates[index].items()}
+           for index in bounded}
+    high = [{candidate: cost + tolerance * abs(cost) for candidate, cost in estimates[index].items()}
+            for index in bounded]
+    best = k_smallest_sums(high, k)
+    if len(best) < k:
+        return 0, len(decisions) - len(bounded)
+
+    # Unbounded decisions add the same amount to a configuration either way, so they cancel out
+    threshold = best[-1][0]
+    lowest = {index: min(costs.values()) for index, costs in low.items()}
+    floor = sum(lowest.values())
+    pruned = 0
+    for index in bounded:
+        decision = decisions[index]
+        keep = [candidate for candidate in decision['candidates']
+                if candidate == decision['current']
+                or floor - lowest[index] + low[index][candidate] <= threshold]
+        pruned += len(decision['candidates']) - len(keep)
+        decision['candidates'] = keep
+    return pruned, len(decisions) - len(bounded)
+
+def check_estimates(decisions, estimates):
+    """Raise when the formula cannot score an item, since analytic totals would be NaN."""
+    for decision, costs in zip(decisions, estimates):
+        if any(np.isnan(cost) for cost in costs.values()):
+            codes = sorted({STAGES[stage_name]['code'] for stage_name, _ in decision['members']})
+            raise ValueError(f"{'+'.join(codes)} item {decision['current']!r} has no emission factors; "
+                             f"give its factors or score it with a model")
+
+def optimize(project, k=5, substitutions=None, tolerance=0.25, mode=None, executor=None):
+    executor = executor or default_executor()
+    frames = {resolve_stage(name): stage_items(resolve_stage(name), items) for name, items in project.items()}
+    substitutions = {resolve_stage(name): options for name, options in (substitutions or {}).items()}
+    decisions = build_decisions(frames, substitutions)
+    stage_names = [name for name in STAGE_ORDER if name in frames and not frames[name].empty]
+    candidate_count = sum(len(decision['candidates']) for decision in decisions)
+
+    # Closed-form bounds, cheap enough to compute for every candidate
+    estimates = [{} for _ in decisions]
+    for stage_name in stage_names:
+        expanded, keys = expand(stage_name, frames[stage_name], decisions)
+        decision_costs(keys, analytic_model(stage_name).predict(build_features(stage_name, expanded)), estimates)
+
+    all_analytic = all((mode or scoring_mode(stage_name)) == ANALYTIC for stage_name in stage_names)
+    if all_analytic:
+        check_estimates(decisions, estimates)
+        costs, pruned, unbounded = estimates, 0, 0
+    else:
+        pruned, unbounded = prune(decisions, estimates, k, tolerance)
+        expansions = {stage_name: expand(stage_name, frames[stage_name], decisions) for stage_name in stage_names}
+        futures = {
+            stage_name: executor.submit(score_stage, stage_name, expanded, False, True, mode)
+            for stage_name, (expanded, _) in expansions.items()
+        }
+        costs = [{} for _ in decisions]
+        for stage_name, future in futures.items():
+            decision_costs(expansions[stage_name][1], future.result(), costs)
+
+    baseline = sum(cost[decision['current']] for decision, cost in zip(decisions, costs))
+    configurations = []
+    for total, choices in k_smallest_sums(costs, k):
+        changes = [
+            {
+                'stages': sorted({STAGES[stage_name]['code'] for stage_name, _ in decision['members']}),
+                'from': decision['current'],
+                'to': choice,
+                'saving': cost[decision['current']] - cost[choice]
+            }
+            for decision, cost, choice in zip(decisions, costs, choices) if choice != decision['current']
+        ]
+        configurations.append({
+            'total': total,
+            'level': emission_level(total / 1000)[0],
+            'saving': baseline - total,
+            'changes': changes
+        })
+
+    return {
+        'baseline': baseline,
+        'configurations': configurations,
+        'decisions': len(decisions),
+        'candidates': candidate_count,
+        'pruned': pruned,
+        'unbounded': unbounded
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the lowest-emission substitutions for a project.")
+    parser.add_argument('project', help="JSON object mapping stage names or codes to lists of line items")
+    parser.add_argument('--top', type=int, default=5, help="Number of configurations to return")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Relative model-vs-formula deviation assumed when pruning")
+    parser.add_argument('--mode', choices=SCORING_MODES,
+                        help="Scoring mode for every stage; CARBON_SCORING_MODE or the stage default otherwise")
+    parser.add_argument('--output', help="Write the result as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with open(args.project, 'r') as file:
+        project = json.load(file)
+    substitutions = project.pop('substitutions', None)
+
+    result = optimize(project, args.top, substitutions, args.tolerance, args.mode)
+    print(f"Baseline: {result['baseline']:.2f} kgCO2e ({result['decisions']} decisions, "
+          f"{result['candidates']} candidates, {result['pruned']} pruned)")
+    if result['unbounded']:
+        print(f"Warning: {result['unbounded']} decisions have items without emission factors and were not pruned")
+    for rank, configuration in enumerate(result['configurations'], 1):
+        print(f"{rank}. {configuration['total']:.2f} kgCO2e - {configuration['level']} "
+              f"(saves {configuration['saving']:.2f})")
+        for change in configuration['changes']:
+            print(f"     {'+'.join(change['stages'])}: {change['from']} -> {change['to']} "
+                  f"(saves {change['saving']:.2f})")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,4 @@
 import sys
-import pandas as pd
-import pickle
-from PySide6.QtWidgets import (QApplication, QMainWindow, QMenuBar, QLabel, QVBoxLayout, QWidget, QTextEdit, QDialog, QFormLayout, QLineEdit, QComboBox, QPushButton, QMessageBox)
-from PySide6.QtGui import QPixmap, QIcon, QAction
-from PySide6.QtCore import Qt
\ No newline at end of file
+from PySide6.QtWidgets import (QApplication, QMainWindow, QMenuBar, QLabel, QVBoxLayout, QWidget, QTextEdit, QDialog, QFormLayout, QLineEdit, QComboBox, QPushButton, QMessageBox, QProgressBar, QHBoxLayout, QSpinBox, QToolTip, QCompleter, QTableView, QHeaderView, QStyledItemDelegate, QFileDialog)
+from PySide6.QtGui import QPixmap, QIcon, QAction, QPainter, QColor, QImage, QPen, QPolygonF
+from PySide6.QtCore import Qt, QTimer, Signal, QObject, QRunnable, QThreadPool, QPointF, QRectF, QFile, QIODevice, QResource, QStringListModel, QAbstractTableModel, QModelIndex
\ No newline at end of file
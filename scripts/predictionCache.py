@@ -0,0 +1,137 @@
+import os
+import json
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from scripts.modelRegistry import ModelRegistry
+from scripts.formula import MODEL, ANALYTIC, scoring_mode
+from scripts import telemetry
+
+DEFAULT_MAXSIZE = 50000
+
+def _normalize(value):
+    """Make feature values hashable and stable: 200 and 200.0 key the same, NaN becomes None."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(number):
+        return None
+    return float(f"{number:.12g}")
+
+def feature_key(stage_name, version, row):
+    return (stage_name, version) + tuple(_normalize(value) for value in row)
+
+class PredictionCache:
+    """Bounded LRU memo of stage predictions keyed on (stage, model version, features)."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(PredictionCache, cls).__new__(cls)
+                cls._instance._entries = OrderedDict()
+                cls._instance._lock = threading.Lock()
+                cls._instance.maxsize = DEFAULT_MAXSIZE
+                cls._instance.hits = 0
+                cls._instance.misses = 0
+        return cls._instance
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def predict(self, stage_name, model, features, version):
+        """Return predictions for every row of a feature frame, calling the model once for the misses."""
+        keys = [feature_key(stage_name, version, row) for row in features.itertuples(index=False, name=None)]
+        values = np.empty(len(keys), dtype=float)
+
+        missing = {}
+        for i, key in enumerate(keys):
+            cached = self.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                values[i] = cached
+
+        # Rows, like self.hits and self.misses; duplicate rows of a miss are still scored only once below
+        missed_rows = sum(len(rows) for rows in missing.values())
+        telemetry.count('prediction_cache_hits', len(keys) - missed_rows, stage=stage_name)
+        telemetry.count('prediction_cache_misses', missed_rows, stage=stage_name)
+        if missing:
+            # Identical rows are scored once
+            first_rows = [rows[0] for rows in missing.values()]
+            predictions = telemetry.predict(model, features.iloc[first_rows], stage=stage_name)
+            for (key, rows), prediction in zip(missing.items(), predictions):
+                prediction = float(prediction)
+                values[rows] = prediction
+                self.put(key, prediction)
+        return values
+
+    def save(self, path):
+        with self._lock:
+            entries = [[list(key), value] for key, value in self._entries.items()]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'entries': entries}, file)
+
+    def load(self, path):
+        try:
+            with open(path, 'r') as file:
+                entries = json.load(file)['entries']
+        except FileNotFoundError:
+            return 0
+        for key, value in entries:
+            self.put(tuple(key), value)
+        return len(entries)
+
+def cached_predict(stage_name, model, features, mode=MODEL):
+    """Predict through the shared cache, keyed on the registry's version of the stage model."""
+    version = ModelRegistry().model_version(stage_name, mode)
+    return PredictionCache().predict(stage_name, model, features, version)
+
+def predict_stage(stage_name, features, mode=None):
+    """Score features in the stage's scoring mode; the formula is cheaper than a cache lookup."""
+    mode = mode or scoring_mode(stage_name)
+    with telemetry.span('predict', stage=stage_name, mode=mode):
+        model = ModelRegistry().get_scorer(stage_name, mode)
+        if mode == ANALYTIC:
+            return telemetry.predict(model, features, stage=stage_name)
+        return cached_predict(stage_name, model, features, mode)
@@ -1,25 +1,28 @@
 
-from scripts.packages import pd, pickle, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
+from scripts.resources import ResourceCache
 from scripts.data import PredictionStore
+from scripts.predictionCache import predict_stage
+from scripts.encoding import category_table, build_features
+from scripts.worker import StageDialogMixin, create_busy_indicator
+from scripts.catalogueSearch import CatalogueCompleter, selected_item, factor_text
+from scripts import telemetry
 
-class ProductionWindow(QDialog):
+class ProductionWindow(StageDialogMixin, QDialog):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Production Stage")
-        self.setWindowIcon(QIcon("resources/images/A1-favicon.png"))
+        self.setWindowIcon(ResourceCache().icon("resources/images/A1-favicon.png"))
         self.setFixedSize(400, 378)
 
-        self.model = self.load_model()
-        self.carbon_factors = {
-            'Aluminium': 11.0, 'Asphalt': 0.1, 'Bricks': 0.5, 'Cement': 0.9, 
-            'Concrete': 0.3, 'Glass': 0.8, 'Plastics': 6.0, 'Steel': 1.8, 
-            'Stone': 0.4, 'Wood': 0.2
-        }
+        self.materials = category_table('production')
 
         self.setup_ui()
         self.update_carbon_factor()  # Set initial carbon factor
 
+        self.start_runners('production')
+
     def setup_ui(self):
         layout = QVBoxLayout(self)
 
@@ -33,8 +36,9 @@ class ProductionWindow(QDialog):
         form_layout = QFormLayout()
 
         self.material_combo = QComboBox()
-        self.material_combo.addItems(self.carbon_factors.keys())
-        self.material_combo.currentIndexChanged.connect(self.update_carbon_factor)
+        self.material_combo.addItems(list(self.materials.names))
+        self.material_completer = CatalogueCompleter('production', self.material_combo)
+        self.material_combo.currentTextChanged.connect(self.update_carbon_factor)
 
         self.mass_input = QLineEdit()
         self.mass_input.setPlaceholderText('Enter mass used (kg)')
@@ -47,30 +51,24 @@ class ProductionWindow(QDialog):
         form_layout.addRow('Mass Used:', self.mass_input)
         form_layout.addRow('Carbon Emission Factor:', self.carbon_factor_input)
 
-        predict_button = QPushButton('Predict Total Carbon Emission')
-        predict_button.clicked.connect(self.predict)
-        form_layout.addRow(predict_button)
+        self.predict_button = QPushButton('Predict Total Carbon Emission')
+        self.predict_button.clicked.connect(self.predict)
+        form_layout.addRow(self.predict_button)
 
         layout.addLayout(form_layout)
 
         self.result_label = QLabel("", self)
         layout.addWidget(self.result_label)
 
-    def load_model(self):
-        try:
-            with open('models/Gradient-Boosting-A1.pkl', 'rb') as file:
-                return pickle.load(file)
-        except (FileNotFoundError, pickle.PickleError) as e:
-            QMessageBox.critical(self, "Model Load Error", f"Could not load model: {str(e)}")
-            return None
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
 
     def update_carbon_factor(self):
-        selected_material = self.material_combo.currentText()
-        carbon_factor = self.carbon_factors.get(selected_material, "")
-        self.carbon_factor_input.setText(str(carbon_factor))
+        item = selected_item('production', self.material_combo)
+        self.carbon_factor_input.setText(factor_text(item.carbon_factor) if item is not None else "")
 
     def predict(self):
-        material = self.material_combo.currentText()
+        item = selected_item('production', self.material_combo)
         mass = self.mass_input.text()
         carbon_factor = self.carbon_factor_input.text()
 
@@ -85,30 +83,29 @@ class ProductionWindow(QDialog):
             QMessageBox.warning(self, "Input Error", "Mass and Carbon Emission Factor must be numeric.")
             return
 
-        material_mapping = {mat: idx for idx, mat in enumerate(self.carbon_factors.keys())}
-        material_num = material_mapping.get(material, -1)
-
-        if material_num == -1:
+        if item is None:
             QMessageBox.warning(self, "Input Error", "Invalid material type selected.")
             return
 
-        features = pd.DataFrame({
-            'Raw_material': [material_num],
-            'Mass_used': [mass],
-            'Carbon_emission_factor': [carbon_factor]
-        })
+        def run_prediction():
+            features = build_features('production', {
+                'Raw_material': item.category,
+                'Mass_used': mass,
+                'Carbon_emission_factor': carbon_factor
+            })
+            return predict_stage('production', features)[0]
+
+        self.predictor.submit(run_prediction, self.show_prediction, self.show_prediction_error)
 
-        if self.model:
-            try:
-                prediction = self.model.predict(features)[0]
-                self.predicted_emission = prediction
+    def show_prediction(self, prediction):
+        with telemetry.span('ui_update', stage='production'):
+            self.predicted_emission = prediction
 
-                store = PredictionStore()
-                store.set_prediction('production', prediction)
+            store = PredictionStore()
+            store.set_prediction('production', prediction)
 
-                self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
-            except Exception as e:
-                QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {str(e)}")
+            self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
 
-    def get_prediction(self):
-        return getattr(self, 'predicted_emission', 0)
+    def clear_inputs(self):
+        self.material_combo.setCurrentIndex(0)
+        self.mass_input.clear()
@@ -0,0 +1,97 @@
+"""Process-wide cache of the texts, icons, pixmaps and stylesheet of the UI.
+
+Every resource is read from disk once and shared by all windows; pixmaps are
+kept per target size, so a scaled logo is only rescaled the first time. If a
+compiled Qt resource bundle (resources.rcc) sits next to main.py, it is
+registered and resources are read from it instead of the individual files:
+
+    pyside6-rcc --binary resources.qrc -o resources.rcc
+"""
+import os
+import threading
+from scripts.packages import QIcon, QPixmap, Qt, QFile, QIODevice, QResource
+
+RESOURCE_BUNDLE = 'resources.rcc'
+
+class ResourceCache:
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ResourceCache, cls).__new__(cls)
+                cls._instance._lock = threading.Lock()
+                cls._instance._texts = {}
+                cls._instance._icons = {}
+                cls._instance._pixmaps = {}
+                cls._instance.bundle = None
+        return cls._instance
+
+    def register_bundle(self, path=RESOURCE_BUNDLE):
+        """Register a compiled resource bundle if one exists; returns whether it is in use."""
+        if self.bundle is None and os.path.exists(path) and QResource.registerResource(path):
+            self.bundle = path
+        return self.bundle is not None
+
+    def resolve(self, path):
+        """Path inside the registered bundle when it holds the file, the file path otherwise."""
+        if self.bundle is not None:
+            bundled = f":/{path}"
+            if QFile.exists(bundled):
+                return bundled
+        return path
+
+    def text(self, path):
+        with self._lock:
+            text = self._texts.get(path)
+        if text is None:
+            text = self._read(path)
+            with self._lock:
+                self._texts[path] = text
+        return text
+
+    def stylesheet(self, path='styles.qss'):
+        return self.text(path)
+
+    def icon(self, path):
+        # Qt pixmaps and icons belong to the GUI thread, so no lock is needed here
+        icon = self._icons.get(path)
+        if icon is None:
+            icon = self._icons[path] = QIcon(self.resolve(path))
+        return icon
+
+    def pixmap(self, path, width=None, height=None):
+        """The image at path, scaled once to fit width x height keeping its aspect ratio."""
+        key = (path, width, height)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            if width is None:
+                pixmap = QPixmap(self.resolve(path))
+            else:
+                pixmap = self.pixmap(path).scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self._pixmaps[key] = pixmap
+        return pixmap
+
+    def clear(self):
+        with self._lock:
+            self._texts.clear()
+        self._icons.clear()
+        self._pixmaps.clear()
+
+    def _read(self, path):
+        resolved = self.resolve(path)
+        try:
+            if resolved.startswith(':/'):
+                file = QFile(resolved)
+                if not file.open(QIODevice.ReadOnly | QIODevice.Text):
+                    raise IOError(file.errorString())
+                try:
+                    return bytes(file.readAll()).decode('utf-8')
+                finally:
+                    file.close()
+            with open(resolved, 'r') as file:
+                return file.read()
+        except Exception as e:
+            print(f"Error loading text from {path}: {e}")
+            return ""
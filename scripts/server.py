@@ -0,0 +1,220 @@
+"""Local HTTP prediction service.
+
+    python -m scripts.server --port 8765 --max-wait-ms 5
+
+Endpoints (JSON in, JSON out):
+    GET  /health                 loaded stages and batching statistics
+    POST /predict/<stage>        {"items": [{...}, ...]} or a single item; stage name or code
+    POST /project                {"A1": [{...}], "A3": [{...}], ...} like scripts/engine.py
+
+Items hold the category and activity columns of the stage; missing fuel rates
+and carbon factors are filled in from the stage tables. Concurrent requests for
+a stage are collected for up to --max-wait-ms (or --max-batch-rows rows) and
+scored with one predict call. Uses only the standard library on top of the
+model dependencies, and binds to localhost by default.
+"""
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from scripts.encoding import build_features
+from scripts.engine import stage_frame
+from scripts.modelRegistry import ModelRegistry
+from scripts.predictionCache import predict_stage
+from scripts.formula import ANALYTIC, SCORING_MODES, scoring_mode
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage, emission_level
+from scripts import telemetry
+
+class MicroBatcher:
+    """Collect concurrent requests for one stage and score them in a single predict call."""
+    def __init__(self, stage_name, max_wait=0.005, max_rows=10000, mode=None):
+        self.stage_name = stage_name
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self.mode = mode
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self.thread = threading.Thread(target=self.run, name=f"batcher-{stage_name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, features):
+        future = Future()
+        self.requests.put((features, future))
+        return future
+
+    def collect(self):
+        """Block for one request, then take more until the latency budget or row limit is reached."""
+        batch = [self.requests.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request[0])
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            features = pd.concat([request[0] for request in batch], ignore_index=True)
+            telemetry.observe('server_batch_requests', len(batch), stage=self.stage_name)
+            try:
+                with telemetry.span('server_batch', stage=self.stage_name):
+                    predictions = np.asarray(predict_stage(self.stage_name, features, self.mode), dtype=float)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(features)
+            start = 0
+            for request_features, future in batch:
+                end = start + len(request_features)
+                future.set_result(predictions[start:end])
+                start = end
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'rows_per_batch': self.rows / self.batches if self.batches else 0.0,
+            'queued': self.requests.qsize()
+        }
+
+def parse_items(payload):
+    items = payload.get('items', payload) if isinstance(payload, dict) else payload
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("Expected an item object or a list of item objects")
+    return items
+
+def stage_result(stage_name, predictions):
+    emission = float(predictions.sum())
+    return {
+        'stage': stage_name,
+        'code': STAGES[stage_name]['code'],
+        'predictions': predictions.tolist(),
+        'emission': emission,
+        'level': emission_level(emission / 1000)[0]
+    }
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_wait=0.005, max_rows=10000, mode=None):
+        super().__init__(address, PredictionHandler)
+        self.batchers = {stage_name: MicroBatcher(stage_name, max_wait, max_rows, mode) for stage_name in STAGE_ORDER}
+
+    def submit(self, stage_name, items):
+        """Queue a stage's items; returns a Future of the per-item predictions."""
+        frame = stage_frame(stage_name, items)
+        if frame.empty:
+            future = Future()
+            future.set_result(np.array([], dtype=float))
+            return future
+        return self.batchers[stage_name].submit(build_features(stage_name, frame))
+
+    def predict_stage(self, stage_name, items):
+        return stage_result(stage_name, self.submit(stage_name, items).result())
+
+    def predict_project(self, project):
+        # Submit every stage before waiting so they share batches with other requests
+        futures = {resolve_stage(name): self.submit(resolve_stage(name), parse_items(items))
+                   for name, items in project.items()}
+        stages = {stage_name: stage_result(stage_name, futures[stage_name].result())
+                  for stage_name in STAGE_ORDER if stage_name in futures}
+        total = sum(stage['emission'] for stage in stages.values())
+        return {'stages': stages, 'total': total, 'level': emission_level(total / 1000)[0]}
+
+    def health(self):
+        registry = ModelRegistry()
+        return {
+            'status': 'ok',
+            'stages': {
+                stage_name: dict(batcher.stats(), loaded=registry.is_loaded(stage_name))
+                for stage_name, batcher in self.batchers.items()
+            }
+        }
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    server_version = "CarbonPredictor/1.0"
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self.send_json(200, self.server.health())
+        else:
+            self.send_json(404, {'error': f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'null')
+            parts = self.path.strip('/').split('/')
+            if len(parts) == 2 and parts[0] == 'predict':
+                result = self.server.predict_stage(resolve_stage(parts[1]), parse_items(payload))
+            elif parts == ['project'] and isinstance(payload, dict):
+                result = self.server.predict_project(payload)
+            else:
+                self.send_json(404, {'error': f"Unknown path: {self.path}"})
+                return
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+        self.send_json(200, result)
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the cost of a batched prediction
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the stage models over HTTP on localhost.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to bind")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help="How long a request may wait for others to join its batch")
+    parser.add_argument('--max-batch-rows', type=int, default=10000, help="Rows that close a batch early")
+    parser.add_argument('--mode', choices=SCORING_MODES,
+                        help="Scoring mode for every stage; CARBON_SCORING_MODE or the stage default otherwise")
+    args = parser.parse_args(argv)
+
+    if any((args.mode or scoring_mode(stage_name)) != ANALYTIC for stage_name in STAGE_ORDER):
+        # Load the scorers of the serving mode, the ones the batchers will ask for
+        ModelRegistry().warm_up(mode=args.mode).join()
+
+    server = PredictionServer((args.host, args.port), args.max_wait_ms / 1000, args.max_batch_rows, args.mode)
+    print(f"Serving predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
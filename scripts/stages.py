@@ -0,0 +1,85 @@
+STAGE_ORDER = [
+    'production',
+    'transportation_to_factory',
+    'manufacturing',
+    'transportation_to_site',
+    'construction'
+]
+
+STAGES = {
+    'production': {
+        'code': 'A1',
+        'model_path': 'models/Gradient-Boosting-A1.pkl',
+        'data_path': 'data/A1-Production-Training.csv',
+        'categorical_feature': 'Raw_material',
+        'numeric_features': ['Mass_used', 'Carbon_emission_factor'],
+        'target_product': ['Mass_used', 'Carbon_emission_factor']
+    },
+    'transportation_to_factory': {
+        'code': 'A2',
+        'model_path': 'models/Gradient-Boosting-A2.pkl',
+        'data_path': 'data/A2-Transportation-to-Factory-Training.csv',
+        'categorical_feature': 'Raw_material',
+        'numeric_features': ['Mass_used', 'Distance_traveled', 'Fuel_consumption_rate', 'Carbon_emission_factor'],
+        'target_product': ['Mass_used', 'Distance_traveled', 'Fuel_consumption_rate', 'Carbon_emission_factor']
+    },
+    'manufacturing': {
+        'code': 'A3',
+        'model_path': 'models/Gradient-Boosting-A3.pkl',
+        'data_path': 'data/A3-Manufacturing-Training.csv',
+        'categorical_feature': 'Manufacturing_equipment',
+        'numeric_features': ['Quantity', 'Fuel_consumption_rate', 'Hours_of_operation', 'Carbon_emission_factor'],
+        'target_product': ['Quantity', 'Fuel_consumption_rate', 'Hours_of_operation', 'Carbon_emission_factor']
+    },
+    'transportation_to_site': {
+        'code': 'A4',
+        'model_path': 'models/Gradient-Boosting-A4.pkl',
+        'data_path': 'data/A4-Transportation-to-Site-Training.csv',
+        'categorical_feature': 'Materials',
+        'numeric_features': ['Mass_used', 'Distance_traveled', 'Fuel_consumption_rate', 'Carbon_emission_factor'],
+        'target_product': ['Mass_used', 'Distance_traveled', 'Fuel_consumption_rate', 'Carbon_emission_factor']
+    },
+    'construction': {
+        'code': 'A5',
+        'model_path': 'models/Gradient-Boosting-A5.pkl',
+        'data_path': 'data/A5-Construction-Training.csv',
+        'categorical_feature': 'Machinery',
+        'numeric_features': ['Quantity', 'Fuel_consumption_rate', 'Hours_of_operation', 'Carbon_emission_factor'],
+        'target_product': ['Quantity', 'Fuel_consumption_rate', 'Hours_of_operation', 'Carbon_emission_factor']
+    }
+}
+
+def resolve_stage(name):
+    """Accept either a stage name ('production') or its code ('A1')."""
+    if name in STAGES:
+        return name
+    for stage_name, stage in STAGES.items():
+        if stage['code'].lower() == str(name).lower():
+            return stage_name
+    raise KeyError(f"Unknown stage: {name}")
+
+def feature_columns(stage_name):
+    stage = STAGES[stage_name]
+    return [stage['categorical_feature']] + stage['numeric_features']
+
+def detect_stage(columns):
+    """Pick the stage whose feature columns are all present, preferring the widest match."""
+    columns = set(columns)
+    matches = [name for name in STAGE_ORDER if set(feature_columns(name)) <= columns]
+    if not matches:
+        raise ValueError("Columns do not match any stage: " + ", ".join(sorted(columns)))
+    return max(matches, key=lambda name: len(feature_columns(name)))
+
+# Band limits in tonnes of CO2e
+SAFE_LIMIT = 500
+AVERAGE_LOWER = 501
+AVERAGE_LIMIT = 2000
+
+def emission_level(emission):
+    """Band an emission given in tonnes of CO2e, as shown in the totals view."""
+    if emission <= SAFE_LIMIT:
+        return "Safe", "lightgreen"
+    elif AVERAGE_LOWER < emission <= AVERAGE_LIMIT:
+        return "Average", "yellow"
+    else:
+        return "Danger", "red"
@@ -0,0 +1,47 @@
+"""What-if sweeps: score a stage over a grid of one or two inputs in one batch.
+
+The form inputs fix every column; each sweep axis replaces one numeric column
+with a range of values. The whole grid (up to MAX_GRID_POINTS rows) is built
+with NumPy and scored by a single predict call.
+"""
+import numpy as np
+from scripts.encoding import build_features
+from scripts.modelRegistry import ModelRegistry
+from scripts.formula import scoring_mode
+from scripts.stages import STAGES
+from scripts import telemetry
+
+MAX_GRID_POINTS = 250000
+
+def axis_values(start, stop, steps):
+    return np.linspace(float(start), float(stop), int(steps))
+
+def sweep(stage_name, inputs, axes, mode=None):
+    """Score inputs with each (column, values) axis swept; returns an array shaped like the grid."""
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("A sweep needs one or two axes")
+    numeric_features = STAGES[stage_name]['numeric_features']
+    for column, _ in axes:
+        if column not in numeric_features:
+            raise ValueError(f"{column} is not a numeric input of {stage_name}")
+    if len(axes) == 2 and axes[0][0] == axes[1][0]:
+        raise ValueError("The two sweep axes must be different inputs")
+
+    shape = tuple(len(values) for _, values in axes)
+    size = int(np.prod(shape))
+    if size > MAX_GRID_POINTS:
+        raise ValueError(f"The grid has {size} points; the limit is {MAX_GRID_POINTS}")
+
+    with telemetry.span('sweep', stage=stage_name):
+        columns = {column: np.full(size, value, dtype=object if isinstance(value, str) else float)
+                   for column, value in inputs.items()}
+        grids = np.meshgrid(*[np.asarray(values, dtype=float) for _, values in axes], indexing='ij')
+        for (column, _), grid in zip(axes, grids):
+            columns[column] = grid.ravel()
+
+        features = build_features(stage_name, columns)
+        mode = mode or scoring_mode(stage_name)
+        # Every grid row is distinct, so the prediction cache would only add key-building cost
+        model = ModelRegistry().get_scorer(stage_name, mode)
+        predictions = telemetry.predict(model, features, stage=stage_name)
+        return np.asarray(predictions, dtype=float).reshape(shape)
@@ -0,0 +1,213 @@
+import numpy as np
+from scripts.packages import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QComboBox, QSpinBox,
+                              QPushButton, QMessageBox, QWidget, QToolTip, QPainter, QColor, QImage, QPen, QPolygonF,
+                              QPointF, QRectF, Qt)
+from scripts.sweep import sweep, axis_values
+from scripts.worker import PredictionRunner, create_busy_indicator
+from scripts import telemetry
+
+NO_AXIS = 'None'
+
+# Low to high emission: green, yellow, red, as in the totals view
+COLOR_STOPS = np.array([[144, 238, 144], [255, 255, 0], [255, 0, 0]], dtype=float)
+
+def colorize(values):
+    """Map values to RGB rows along COLOR_STOPS."""
+    low, high = np.nanmin(values), np.nanmax(values)
+    scaled = (values - low) / (high - low) if high > low else np.zeros_like(values)
+    position = np.nan_to_num(scaled) * (len(COLOR_STOPS) - 1)
+    index = np.minimum(position.astype(int), len(COLOR_STOPS) - 2)
+    fraction = (position - index)[..., None]
+    return (COLOR_STOPS[index] * (1 - fraction) + COLOR_STOPS[index + 1] * fraction).astype(np.uint8)
+
+class SweepPlot(QWidget):
+    """Response curve for one axis, heatmap for two; hover shows the value under the cursor."""
+    MARGIN = 48
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(360, 260)
+        self.setMouseTracking(True)
+        self.axes = None
+        self.values = None
+        self.image = None
+
+    def set_result(self, axes, values):
+        self.axes = axes
+        self.values = values
+        self.image = None
+        if values.ndim == 2:
+            # Image rows run top to bottom, so the second axis is flipped to grow upwards
+            pixels = np.ascontiguousarray(colorize(values.T[::-1]))
+            height, width, _ = pixels.shape
+            self.image = QImage(pixels.tobytes(), width, height, 3 * width, QImage.Format_RGB888).copy()
+        self.update()
+
+    def plot_rect(self):
+        return QRectF(self.MARGIN, 12, self.width() - self.MARGIN - 12, self.height() - self.MARGIN - 12)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self.plot_rect()
+        if self.values is None:
+            painter.drawText(self.rect(), Qt.AlignCenter, "Choose the axes and run the sweep")
+            return
+
+        x_name, x_values = self.axes[0]
+        if self.image is not None:
+            painter.drawImage(rect, self.image)
+            y_name, y_values = self.axes[1]
+            y_low, y_high = y_values[0], y_values[-1]
+            legend = f"{np.nanmin(self.values):.2f} - {np.nanmax(self.values):.2f} kgCO2e"
+        else:
+            y_name = 'kgCO2e'
+            y_low, y_high = float(np.nanmin(self.values)), float(np.nanmax(self.values))
+            span = (y_high - y_low) or 1.0
+            points = QPolygonF([
+                QPointF(rect.left() + rect.width() * i / max(len(self.values) - 1, 1),
+                        rect.bottom() - rect.height() * (value - y_low) / span)
+                for i, value in enumerate(self.values)
+            ])
+            painter.setPen(QPen(QColor(33, 150, 243), 2))
+            painter.drawPolyline(points)
+            legend = ''
+
+        painter.setPen(QPen(QColor(51, 51, 51), 1))
+        painter.drawRect(rect)
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 4, rect.width(), 16), Qt.AlignLeft, f"{x_values[0]:g}")
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 4, rect.width(), 16), Qt.AlignRight, f"{x_values[-1]:g}")
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 20, rect.width(), 16), Qt.AlignCenter, x_name)
+        painter.drawText(QRectF(0, rect.bottom() - 16, self.MARGIN - 4, 16), Qt.AlignRight, f"{y_low:.4g}")
+        painter.drawText(QRectF(0, rect.top(), self.MARGIN - 4, 16), Qt.AlignRight, f"{y_high:.4g}")
+        painter.drawText(QRectF(0, rect.center().y() - 8, self.MARGIN - 4, 16), Qt.AlignRight, y_name[:8])
+        if legend:
+            painter.drawText(QRectF(rect.left(), rect.bottom() + 20, rect.width(), 16), Qt.AlignRight, legend)
+
+    def mouseMoveEvent(self, event):
+        if self.values is None:
+            return
+        rect = self.plot_rect()
+        position = event.position()
+        if not rect.contains(position):
+            QToolTip.hideText()
+            return
+        x_name, x_values = self.axes[0]
+        i = min(int((position.x() - rect.left()) / rect.width() * len(x_values)), len(x_values) - 1)
+        if self.values.ndim == 2:
+            y_name, y_values = self.axes[1]
+            j = min(int((rect.bottom() - position.y()) / rect.height() * len(y_values)), len(y_values) - 1)
+            text = f"{x_name} {x_values[i]:g}, {y_name} {y_values[j]:g}: {self.values[i, j]:.2f} kgCO2e"
+        else:
+            text = f"{x_name} {x_values[i]:g}: {self.values[i]:.2f} kgCO2e"
+        QToolTip.showText(event.globalPosition().toPoint(), text, self)
+
+class SweepWindow(QDialog):
+    """Sweep one or two inputs of a stage around the values in its form.
+
+    read_inputs returns the form values as {column: value} and raises
+    ValueError when they are incomplete; axis_labels maps the sweepable
+    numeric columns to their form labels.
+    """
+    def __init__(self, stage_name, read_inputs, axis_labels, parent=None):
+        super().__init__(parent)
+        self.stage_name = stage_name
+        self.read_inputs = read_inputs
+        self.axis_labels = axis_labels
+        self.runner = PredictionRunner(self)
+        self.setup_ui()
+        self.runner.busy_changed.connect(self.busy_indicator.setVisible)
+
+    def setup_ui(self):
+        self.setWindowTitle("What-if Sweep")
+        self.resize(520, 560)
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+        self.axis_controls = [self.create_axis_row(form_layout, 'Axis 1:', 0),
+                              self.create_axis_row(form_layout, 'Axis 2:', 1)]
+        layout.addLayout(form_layout)
+
+        self.run_button = QPushButton('Run Sweep')
+        self.run_button.clicked.connect(self.run_sweep)
+        layout.addWidget(self.run_button)
+
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
+
+        self.plot = SweepPlot(self)
+        layout.addWidget(self.plot, 1)
+
+        self.result_label = QLabel("", self)
+        layout.addWidget(self.result_label)
+
+    def create_axis_row(self, form_layout, label, index):
+        combo = QComboBox()
+        if index > 0:
+            combo.addItem(NO_AXIS, None)
+        for column, column_label in self.axis_labels.items():
+            combo.addItem(column_label, column)
+
+        start, stop = QLineEdit(), QLineEdit()
+        steps = QSpinBox()
+        steps.setRange(2, 1000)
+        steps.setValue(100 if index == 0 else 50)
+
+        row = QHBoxLayout()
+        row.addWidget(combo, 2)
+        for caption, widget in (('from', start), ('to', stop), ('steps', steps)):
+            row.addWidget(QLabel(caption))
+            row.addWidget(widget, 1)
+        form_layout.addRow(label, row)
+
+        controls = {'combo': combo, 'start': start, 'stop': stop, 'steps': steps}
+        combo.currentIndexChanged.connect(lambda _: self.fill_range(controls))
+        self.fill_range(controls)
+        return controls
+
+    def fill_range(self, controls):
+        """Default an axis to 0 .. twice the current form value."""
+        column = controls['combo'].currentData()
+        if column is None:
+            return
+        try:
+            current = float(self.read_inputs().get(column, 0.0))
+        except ValueError:
+            current = 0.0
+        controls['start'].setText('0')
+        controls['stop'].setText(f"{2 * current:g}" if current > 0 else '100')
+
+    def read_axes(self):
+        axes = []
+        for controls in self.axis_controls:
+            column = controls['combo'].currentData()
+            if column is None:
+                continue
+            try:
+                values = axis_values(controls['start'].text(), controls['stop'].text(), controls['steps'].value())
+            except ValueError:
+                raise ValueError(f"The range of {self.axis_labels[column]} must be numeric.")
+            axes.append((column, values))
+        return axes
+
+    def run_sweep(self):
+        try:
+            inputs = self.read_inputs()
+            axes = self.read_axes()
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
+            return
+
+        stage_name = self.stage_name
+        self.runner.submit(lambda: (axes, sweep(stage_name, inputs, axes)), self.show_result, self.show_error)
+
+    def show_result(self, result):
+        with telemetry.span('ui_update', stage=f"{self.stage_name}-sweep"):
+            axes, values = result
+            labelled = [(self.axis_labels[column], points) for column, points in axes]
+            self.plot.set_result(labelled, values)
+            self.result_label.setText(f"{values.size} points: {np.nanmin(values):.2f} - "
+                                      f"{np.nanmax(values):.2f} kgCO2e")
+
+    def show_error(self, message):
+        QMessageBox.critical(self, "Sweep Error", f"An error occurred during the sweep: {message}")
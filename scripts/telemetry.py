@@ -0,0 +1,180 @@
+"""Opt-in timing and counters for the prediction paths.
+
+    CARBON_TELEMETRY=1 python main.py
+    CARBON_TELEMETRY=trace.json python -m scripts.batch boq-A1.csv
+    CARBON_TELEMETRY=metrics.prom python -m scripts.engine project.json
+
+With CARBON_TELEMETRY unset, span() returns one shared no-op context manager
+and count()/observe() return after a single flag check. When it is set, spans
+are recorded as duration histograms and as Chrome trace events (open the JSON
+in chrome://tracing or Perfetto). The value names the file written at exit:
+*.json for a Chrome trace, anything else for Prometheus text; "1" (or "true")
+prints the Prometheus text to stderr instead.
+
+A 'predict' span covers a stage prediction including the cache lookup. Inside
+it, pickled pipelines are split into 'transform' (ColumnTransformer) and
+'booster' (XGBoost) spans and other scorers get one 'model' span. 'features'
+times DataFrame construction, and there are 'model_load' and 'ui_update'
+spans, plus per-chunk and per-batch spans in the batch, engine and server paths.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict, deque
+
+TELEMETRY_VARIABLE = 'CARBON_TELEMETRY'
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_TRACE_EVENTS = 100000
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class Telemetry:
+    """Process-wide counters, histograms and trace events."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(Telemetry, cls).__new__(cls)
+                cls._instance._lock = threading.Lock()
+                cls._instance._started = time.perf_counter()
+                cls._instance.reset()
+        return cls._instance
+
+    def reset(self):
+        with self._lock:
+            self.counters = defaultdict(float)
+            self.histograms = {}
+            self.events = deque(maxlen=MAX_TRACE_EVENTS)
+
+    def count(self, name, value=1, labels=()):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record_span(self, name, started, duration, labels):
+        self.observe(f"{name}_seconds", duration, labels)
+        with self._lock:
+            self.events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (started - self._started) * 1e6,
+                'dur': duration * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': dict(labels)
+            })
+
+    def prometheus_text(self):
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+        for (name, labels), value in counters:
+            lines.append(f"carbon_{name}_total{label_text(labels)} {value:g}")
+        for (name, labels), histogram in histograms:
+            for bound, bucket in zip(BUCKETS, histogram['buckets']):
+                lines.append(f"carbon_{name}_bucket{label_text(labels, [('le', f'{bound:g}')])} {bucket}")
+            lines.append(f"carbon_{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"carbon_{name}_sum{label_text(labels)} {histogram['sum']:.9f}")
+            lines.append(f"carbon_{name}_count{label_text(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def chrome_trace(self):
+        with self._lock:
+            return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        if path.lower().endswith('.json'):
+            with open(path, 'w') as file:
+                json.dump(self.chrome_trace(), file)
+        else:
+            with open(path, 'w') as file:
+                file.write(self.prometheus_text())
+
+class Span:
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        Telemetry().record_span(self.name, self.started, time.perf_counter() - self.started, self.labels)
+        return False
+
+_setting = os.environ.get(TELEMETRY_VARIABLE, '')
+enabled = _setting.lower() not in ('', '0', 'false', 'no', 'off')
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def span(name, **labels):
+    """Time a block: `with span('predict', stage='production'): ...`."""
+    if not enabled:
+        return _NO_SPAN
+    return Span(name, _labels(labels))
+
+def count(name, value=1, **labels):
+    if enabled:
+        Telemetry().count(name, value, _labels(labels))
+
+def observe(name, value, **labels):
+    if enabled:
+        Telemetry().observe(name, value, _labels(labels))
+
+def predict(model, features, **labels):
+    """model.predict(features), split into preprocessing and booster spans for sklearn pipelines."""
+    if not enabled:
+        return model.predict(features)
+    count('predicted_rows', len(features), **labels)
+    steps = getattr(model, 'steps', None)
+    if steps is None:
+        with span('model', **labels):
+            return model.predict(features)
+    X = features
+    with span('transform', **labels):
+        for _, step in steps[:-1]:
+            X = step.transform(X)
+    with span('booster', **labels):
+        return steps[-1][1].predict(X)
+
+def _export():
+    if _setting.lower() in ('1', 'true', 'yes', 'on'):
+        sys.stderr.write(Telemetry().prometheus_text())
+    else:
+        Telemetry().write(_setting)
+
+if enabled:
+    atexit.register(_export)
@@ -1,8 +1,4 @@
 def load_text(file_path):
-    """Load the welcome text from the specified file."""
-    try:
-        with open(file_path, 'r') as file:
-            return file.read()
-    except Exception as e:
-        print(f"Error loading text from {file_path}: {e}")
-        return ""
+    """Load the text of the specified file, read once per process."""
+    from scripts.resources import ResourceCache
+    return ResourceCache().text(file_path)
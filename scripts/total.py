@@ -1,16 +1,46 @@
-from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import Signal, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
-from scripts.data import PredictionStore
+from scripts.resources import ResourceCache
+from scripts.data import PredictionStore, DEFAULT_PROJECT, DEFAULT_SCENARIO
+from scripts.stages import STAGE_ORDER, emission_level
+from scripts import telemetry
 
 class TotalWindow(QDialog):
-    def __init__(self):
+    # Store callbacks can come from worker threads; the signal hands them to the GUI thread
+    prediction_changed = Signal(object)
+
+    def __init__(self, project=DEFAULT_PROJECT, scenario=DEFAULT_SCENARIO):
         super().__init__()
+        self.project = project
+        self.scenario = scenario
+        self.stage_values = {}
+        self.total_emission = 0.0
+        # Version of the last applied write per stage; writers notify outside the
+        # store lock, so events of different stages can arrive out of order
+        self.stage_versions = {}
+
         self.setup_ui()
-        self.update_predictions()
+
+        # The dialog is reused, so it listens to the store only while it is shown
+        self.prediction_changed.connect(self.on_prediction_changed)
+        self.unsubscribe = None
+        self.finished.connect(self.stop_listening)
+
+    def showEvent(self, event):
+        if self.unsubscribe is None:
+            # Subscribe before reading so no write is missed; stale events are skipped by version
+            self.unsubscribe = PredictionStore().subscribe(self.prediction_changed.emit)
+            self.update_predictions()
+        super().showEvent(event)
+
+    def stop_listening(self, _=None):
+        if self.unsubscribe is not None:
+            self.unsubscribe()
+            self.unsubscribe = None
 
     def setup_ui(self):
         self.setWindowTitle("Total Carbon Emission")
-        self.setWindowIcon(QIcon("resources/images/total-favicon.png"))
+        self.setWindowIcon(ResourceCache().icon("resources/images/Total-favicon.png"))
         self.setFixedSize(400, 480)
 
         # Main layout
@@ -51,6 +81,13 @@ class TotalWindow(QDialog):
         form_layout.addRow('Utts:', self.transportation_to_site_input)
         form_layout.addRow('Ucon:', self.construction_input)
 
+        self.stage_inputs = {
+            'production': self.production_input,
+            'transportation_to_factory': self.transportation_to_factory_input,
+            'manufacturing': self.manufacturing_input,
+            'transportation_to_site': self.transportation_to_site_input,
+            'construction': self.construction_input
+        }
         return form_layout
 
     def create_read_only_input(self):
@@ -60,12 +97,13 @@ class TotalWindow(QDialog):
 
     def update_predictions(self):
         try:
-            store = PredictionStore()
-            self.update_field(self.production_input, store.get_prediction('production'))
-            self.update_field(self.transportation_to_factory_input, store.get_prediction('transportation_to_factory'))
-            self.update_field(self.manufacturing_input, store.get_prediction('manufacturing'))
-            self.update_field(self.transportation_to_site_input, store.get_prediction('transportation_to_site'))
-            self.update_field(self.construction_input, store.get_prediction('construction'))
+            version, snapshot = PredictionStore().versioned_snapshot()
+            predictions = snapshot.get((self.project, self.scenario), {})
+            for stage_name in STAGE_ORDER:
+                self.stage_versions[stage_name] = version
+                self.stage_values[stage_name] = predictions.get(stage_name, 0.0)
+                self.update_field(self.stage_inputs[stage_name], self.stage_values[stage_name])
+            self.total_emission = sum(self.stage_values.values())
             self.update_total_emission()
         except Exception as e:
             QMessageBox.critical(self, "Initialization Error", f"An error occurred while updating predictions: {str(e)}")
@@ -75,24 +113,30 @@ class TotalWindow(QDialog):
         field.setText(f"{prediction:.2f} kgCO2e - {level}")
         field.setStyleSheet(f"background-color: {color}; color: black;")
 
+    def on_prediction_changed(self, event):
+        if event.stage_name is None:
+            # A clear() of everything, of this project or of this scenario
+            if event.project in (None, self.project) and event.scenario in (None, self.scenario):
+                self.update_predictions()
+            return
+        if (event.project, event.scenario) != (self.project, self.scenario) or event.stage_name not in self.stage_inputs:
+            return
+        if event.version <= self.stage_versions.get(event.stage_name, 0):
+            return
+        self.stage_versions[event.stage_name] = event.version
+        # Only the changed stage is redrawn and the total is adjusted by the difference
+        with telemetry.span('ui_update', stage='total'):
+            self.total_emission += event.new_value - self.stage_values.get(event.stage_name, 0.0)
+            self.stage_values[event.stage_name] = event.new_value
+            self.update_field(self.stage_inputs[event.stage_name], event.new_value)
+            self.update_total_emission()
+
     def update_total_emission(self):
-        store = PredictionStore()
-        total_emission = sum([
-            store.get_prediction('production'),
-            store.get_prediction('transportation_to_factory'),
-            store.get_prediction('manufacturing'),
-            store.get_prediction('transportation_to_site'),
-            store.get_prediction('construction')
-        ])
+        total_emission = self.total_emission
         level, color = self.determine_emission_level(total_emission / 1000)
         self.result_label.setText(f"Calculated Total Carbon Emission: <b>{total_emission:.2f} kgCO2e</b> - <b>{level}</b>")
 
        # self.result_label.setStyleSheet(f"color: {color};")
 
     def determine_emission_level(self, emission):
-        if emission <= 500:
-            return "Safe", "lightgreen"
-        elif 501 < emission <= 2000:
-            return "Average", "yellow"
-        else:
-            return "Danger", "red"
\ No newline at end of file
+        return emission_level(emission)
\ No newline at end of file
@@ -1,27 +1,26 @@
-from scripts.packages import pd, pickle, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
+from scripts.resources import ResourceCache
 from scripts.data import PredictionStore
+from scripts.predictionCache import predict_stage
+from scripts.encoding import category_table, build_features
+from scripts.worker import StageDialogMixin, create_busy_indicator
+from scripts.catalogueSearch import CatalogueCompleter, selected_item, factor_text
+from scripts import telemetry
 
-class FactoryWindow(QDialog):
+class FactoryWindow(StageDialogMixin, QDialog):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Transportation to Factory Stage")
-        self.setWindowIcon(QIcon("resources/images/A2-favicon.png"))
+        self.setWindowIcon(ResourceCache().icon("resources/images/A2-favicon.png"))
         self.setFixedSize(400, 520)
 
-        self.materials = [
-            'Aluminium', 'Asphalt', 'Bricks', 'Cement', 'Concrete', 'Glass', 
-            'Plastics', 'Steel', 'Stone', 'Wood'
-        ]
-        self.carbon_factors = {
-            'Aluminium': 11.0, 'Asphalt': 0.1, 'Bricks': 0.5, 'Cement': 0.9, 
-            'Concrete': 0.3, 'Glass': 0.8, 'Plastics': 6.0, 'Steel': 1.8, 
-            'Stone': 0.4, 'Wood': 0.2
-        }
-
-        self.model = self.load_model()
+        self.materials = category_table('transportation_to_factory')
+
         self.setup_ui()
-        self.update_carbon_factor()  # Set initial carbon factor
+        self.update_factors()  # Set initial factors
+
+        self.start_runners('transportation_to_factory')
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -36,8 +35,9 @@ class FactoryWindow(QDialog):
 
         # Create dropdown and input fields
         self.material_combo = QComboBox()
-        self.material_combo.addItems(self.materials)
-        self.material_combo.currentIndexChanged.connect(self.update_carbon_factor)
+        self.material_combo.addItems(list(self.materials.names))
+        self.material_completer = CatalogueCompleter('transportation_to_factory', self.material_combo)
+        self.material_combo.currentTextChanged.connect(self.update_factors)
 
         self.mass_input = QLineEdit()
         self.mass_input.setPlaceholderText('Enter mass used (kg)')
@@ -46,7 +46,7 @@ class FactoryWindow(QDialog):
         self.distance_input.setPlaceholderText('Enter distance traveled (km)')
 
         self.fuel_consumption_input = QLineEdit()
-        self.fuel_consumption_input.setText('0.4')
+        self.fuel_consumption_input.setText(f"{self.materials.fuel_rates[0]:g}")
         self.fuel_consumption_input.setReadOnly(True)
 
         self.carbon_factor_input = QLineEdit()
@@ -60,9 +60,9 @@ class FactoryWindow(QDialog):
         form_layout.addRow('Fuel Consumption Rate:', self.fuel_consumption_input)
         form_layout.addRow('Carbon Emission Factor:', self.carbon_factor_input)
 
-        predict_button = QPushButton('Predict Total Carbon Emission')
-        predict_button.clicked.connect(self.predict)
-        form_layout.addRow(predict_button)
+        self.predict_button = QPushButton('Predict Total Carbon Emission')
+        self.predict_button.clicked.connect(self.predict)
+        form_layout.addRow(self.predict_button)
 
         layout.addLayout(form_layout)
 
@@ -70,18 +70,19 @@ class FactoryWindow(QDialog):
         self.result_label = QLabel("", self)
         layout.addWidget(self.result_label)
 
-    def load_model(self):
-        try:
-            with open('models/Gradient-Boosting-A2.pkl', 'rb') as file:
-                return pickle.load(file)
-        except (FileNotFoundError, pickle.UnpicklingError) as e:
-            QMessageBox.critical(self, "Model Error", f"Error loading model: {str(e)}")
-            return None
+        # Shown while the model is predicting
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
 
-    def update_carbon_factor(self):
-        selected_material = self.material_combo.currentText()
-        carbon_factor = self.carbon_factors.get(selected_material, "")
-        self.carbon_factor_input.setText(str(carbon_factor))
+    def update_factors(self):
+        item = selected_item('transportation_to_factory', self.material_combo)
+        if item is None:
+            self.carbon_factor_input.setText("")
+            return
+        self.carbon_factor_input.setText(factor_text(item.carbon_factor))
+        # Catalogue items may carry their own fuel rate; the stage-wide rate applies otherwise
+        fuel_rate = item.fuel_rate if item.fuel_rate is not None else self.materials.fuel_rates[0]
+        self.fuel_consumption_input.setText(factor_text(fuel_rate))
 
     def predict(self):
         try:
@@ -93,27 +94,32 @@ class FactoryWindow(QDialog):
             QMessageBox.warning(self, "Input Error", "All inputs must be numeric.")
             return
 
-        material_num = self.materials.index(self.material_combo.currentText())
+        item = selected_item('transportation_to_factory', self.material_combo)
+        if item is None:
+            QMessageBox.warning(self, "Input Error", "Invalid material type selected.")
+            return
 
-        if self.model:
-            features = pd.DataFrame({
-                'Raw_material': [material_num],
-                'Mass_used': [mass],
-                'Distance_traveled': [distance_traveled],
-                'Fuel_consumption_rate': [fuel_consumption],
-                'Carbon_emission_factor': [carbon_factor]
+        def run_prediction():
+            features = build_features('transportation_to_factory', {
+                'Raw_material': item.category,
+                'Mass_used': mass,
+                'Distance_traveled': distance_traveled,
+                'Fuel_consumption_rate': fuel_consumption,
+                'Carbon_emission_factor': carbon_factor
             })
+            return predict_stage('transportation_to_factory', features)[0]
+
+        self.predictor.submit(run_prediction, self.show_prediction, self.show_prediction_error)
 
-            try:
-                prediction = self.model.predict(features)[0]
-                self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
+    def show_prediction(self, prediction):
+        with telemetry.span('ui_update', stage='transportation_to_factory'):
+            self.predicted_emission = prediction
+            self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
 
-                store = PredictionStore()
-                store.set_prediction('transportation_to_factory', prediction)
-            except Exception as e:
-                QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {str(e)}")
-        else:
-            QMessageBox.critical(self, "Model Error", "Prediction model is not loaded.")
+            store = PredictionStore()
+            store.set_prediction('transportation_to_factory', prediction)
 
-    def get_prediction(self):
-        return getattr(self, 'predicted_emission', 0)
+    def clear_inputs(self):
+        self.material_combo.setCurrentIndex(0)
+        self.mass_input.clear()
+        self.distance_input.clear()
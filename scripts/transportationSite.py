@@ -1,23 +1,25 @@
-from scripts.packages import pd, pickle, QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox, QIcon
+from scripts.packages import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QComboBox, QPushButton, QTextEdit, QMessageBox
 from scripts.textStorage import load_text
+from scripts.resources import ResourceCache
 from scripts.data import PredictionStore
+from scripts.predictionCache import predict_stage
+from scripts.encoding import category_table, build_features
+from scripts.worker import StageDialogMixin, create_busy_indicator
+from scripts.catalogueSearch import CatalogueCompleter, selected_item, factor_text
+from scripts import telemetry
 
-class SiteWindow(QDialog):
+class SiteWindow(StageDialogMixin, QDialog):
     def __init__(self):
         super().__init__()
-        self.material_factors = {
-            'AAC blocks': 0.6, 'Aluminium studs': 11, 'Cement board': 0.7,
-            'Door frame': 0.6, 'Duct tape': 0.3, 'Fiberboard': 0.6,
-            'Metal siding': 2.5, 'Resins': 7.5, 'Stainless steel': 4, 'Stone wool': 3
-        }
-        self.materials = list(self.material_factors.keys())
+        self.materials = category_table('transportation_to_site')
         self.setup_ui()
-        self.model = self.load_model()
-        self.update_carbon_factor()  # Set initial carbon factor based on default selection
+        self.update_factors()  # Set initial factors based on default selection
+
+        self.start_runners('transportation_to_site')
 
     def setup_ui(self):
         self.setWindowTitle("Transportation to Site Stage")
-        self.setWindowIcon(QIcon("resources/images/A4-favicon.png"))
+        self.setWindowIcon(ResourceCache().icon("resources/images/A4-favicon.png"))
         self.setFixedSize(400, 520)
 
         layout = QVBoxLayout(self)
@@ -34,6 +36,10 @@ class SiteWindow(QDialog):
         self.result_label = QLabel("", self)
         layout.addWidget(self.result_label)
 
+        # Busy indicator, shown while the model is predicting
+        self.busy_indicator = create_busy_indicator(self)
+        layout.addWidget(self.busy_indicator)
+
     def create_text_edit(self, file_path):
         text_edit = QTextEdit(self)
         text_edit.setPlainText(load_text(file_path))
@@ -45,7 +51,8 @@ class SiteWindow(QDialog):
 
         # Material combo box
         self.material_combo = self.create_combo_box()
-        self.material_combo.currentIndexChanged.connect(self.update_carbon_factor)
+        self.material_completer = CatalogueCompleter('transportation_to_site', self.material_combo)
+        self.material_combo.currentTextChanged.connect(self.update_factors)
 
         # Input fields
         self.mass_input = self.create_input('Enter mass used (kg)')
@@ -53,7 +60,7 @@ class SiteWindow(QDialog):
         
         # Fuel consumption input (fixed value set directly)
         self.fuel_consumption_input = self.create_input(read_only=True)
-        self.fuel_consumption_input.setText('0.4')  # Set default value
+        self.fuel_consumption_input.setText(f"{self.materials.fuel_rates[0]:g}")
 
         # Carbon factor input (set value based on selection)
         self.carbon_factor_input = self.create_input('', read_only=True)
@@ -66,15 +73,15 @@ class SiteWindow(QDialog):
         form_layout.addRow('Carbon Emission Factor:', self.carbon_factor_input)
 
         # Predict button
-        predict_button = QPushButton('Predict Total Carbon Emission')
-        predict_button.clicked.connect(self.predict)
-        form_layout.addRow(predict_button)
+        self.predict_button = QPushButton('Predict Total Carbon Emission')
+        self.predict_button.clicked.connect(self.predict)
+        form_layout.addRow(self.predict_button)
 
         return form_layout
 
     def create_combo_box(self):
         combo_box = QComboBox()
-        combo_box.addItems(self.materials)
+        combo_box.addItems(list(self.materials.names))
         return combo_box
 
     def create_input(self, placeholder_text='', read_only=False):
@@ -83,52 +90,54 @@ class SiteWindow(QDialog):
         input_field.setReadOnly(read_only)
         return input_field
 
-    def load_model(self):
-        model_path = 'models/Gradient-Boosting-A4.pkl'
-        try:
-            with open(model_path, 'rb') as file:
-                return pickle.load(file)
-        except (FileNotFoundError, pickle.UnpicklingError) as e:
-            QMessageBox.critical(self, "Model Error", f"Error loading model: {str(e)}")
-            return None
-
-    def update_carbon_factor(self):
-        selected_material = self.material_combo.currentText()
-        carbon_factor = self.material_factors.get(selected_material, "")
-        self.carbon_factor_input.setText(str(carbon_factor))
+    def update_factors(self):
+        item = selected_item('transportation_to_site', self.material_combo)
+        if item is None:
+            self.carbon_factor_input.setText("")
+            return
+        self.carbon_factor_input.setText(factor_text(item.carbon_factor))
+        # Catalogue items may carry their own fuel rate; the stage-wide rate applies otherwise
+        fuel_rate = item.fuel_rate if item.fuel_rate is not None else self.materials.fuel_rates[0]
+        self.fuel_consumption_input.setText(factor_text(fuel_rate))
 
     def predict(self):
         try:
-            material = self.material_combo.currentText()
             mass = float(self.mass_input.text())
             distance_traveled = float(self.distance_input.text())
             fuel_consumption = float(self.fuel_consumption_input.text())
             carbon_factor = float(self.carbon_factor_input.text())
-
-            material_num = self.materials.index(material)
-            features = pd.DataFrame({
-                'Materials': [material_num],
-                'Mass_used': [mass],
-                'Distance_traveled': [distance_traveled],
-                'Fuel_consumption_rate': [fuel_consumption],
-                'Carbon_emission_factor': [carbon_factor]
-            })
-
-            if self.model:
-                prediction = self.model.predict(features)[0]
-                self.store_prediction(prediction)
-                self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
-            else:
-                QMessageBox.critical(self, "Model Error", "Prediction model is not loaded.")
         except ValueError:
             QMessageBox.warning(self, "Input Error", "All inputs must be numeric.")
-        except Exception as e:
-            QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {str(e)}")
+            return
+
+        item = selected_item('transportation_to_site', self.material_combo)
+        if item is None:
+            QMessageBox.warning(self, "Input Error", "Invalid material type selected.")
+            return
+
+        def run_prediction():
+            features = build_features('transportation_to_site', {
+                'Materials': item.category,
+                'Mass_used': mass,
+                'Distance_traveled': distance_traveled,
+                'Fuel_consumption_rate': fuel_consumption,
+                'Carbon_emission_factor': carbon_factor
+            })
+            return predict_stage('transportation_to_site', features)[0]
+
+        self.predictor.submit(run_prediction, self.show_prediction, self.show_prediction_error)
+
+    def show_prediction(self, prediction):
+        with telemetry.span('ui_update', stage='transportation_to_site'):
+            self.store_prediction(prediction)
+            self.result_label.setText(f"Predicted Total Carbon Emission: <b>{prediction:.2f} kgCO2e </b>")
 
     def store_prediction(self, prediction):
         store = PredictionStore()
         store.set_prediction('transportation_to_site', prediction)
         self.predicted_emission = prediction
 
-    def get_prediction(self):
-        return getattr(self, 'predicted_emission', 0)
+    def clear_inputs(self):
+        self.material_combo.setCurrentIndex(0)
+        self.mass_input.clear()
+        self.distance_input.clear()
@@ -0,0 +1,232 @@
+"""Compiled NumPy form of the stage pipelines.
+
+compile_pipeline flattens a trained Pipeline (ColumnTransformer + imputers +
+OneHotEncoder + XGBRegressor) into plain arrays, and CompiledModel scores rows
+from those arrays without importing sklearn or xgboost.
+
+Compile every stage after running the train scripts:
+    python -m scripts.treeModel --check
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage
+
+FORMAT_VERSION = 1
+
+def compiled_model_path(stage_name):
+    return os.path.splitext(STAGES[stage_name]['model_path'])[0] + '.npz'
+
+def _base_score(booster):
+    config = json.loads(booster.save_config())
+    value = config['learner']['learner_model_param']['base_score']
+    # Newer XGBoost releases store the intercept as a vector: "[1.2E2]"
+    return float(value.strip('[]').split(',')[0])
+
+def _feature_index(split, feature_names):
+    if feature_names:
+        return feature_names.index(split)
+    return int(split[1:])
+
+def _flatten_trees(booster):
+    feature_names = booster.feature_names
+    feature, threshold, left, right, missing, value, roots = [], [], [], [], [], [], []
+    max_depth = 0
+
+    for dump in booster.get_dump(dump_format='json'):
+        tree = json.loads(dump)
+        offset = len(feature)
+        nodes = {}
+
+        def collect(node, depth):
+            nodes[node['nodeid']] = (node, depth)
+            for child in node.get('children', []):
+                collect(child, depth + 1)
+
+        collect(tree, 0)
+        # Node ids can have gaps after pruning, so renumber them densely
+        position = {node_id: offset + i for i, node_id in enumerate(sorted(nodes))}
+        for node_id in sorted(nodes):
+            node, depth = nodes[node_id]
+            max_depth = max(max_depth, depth)
+            if 'leaf' in node:
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(-1)
+                right.append(-1)
+                missing.append(-1)
+                value.append(node['leaf'])
+            else:
+                feature.append(_feature_index(node['split'], feature_names))
+                threshold.append(node['split_condition'])
+                left.append(position[node['yes']])
+                right.append(position[node['no']])
+                missing.append(position[node['missing']])
+                value.append(0.0)
+        roots.append(position[tree['nodeid']])
+
+    return {
+        'feature': np.asarray(feature, dtype=np.int32),
+        'threshold': np.asarray(threshold, dtype=np.float32),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'missing': np.asarray(missing, dtype=np.int32),
+        'value': np.asarray(value, dtype=np.float32),
+        'roots': np.asarray(roots, dtype=np.int32)
+    }, max_depth
+
+def extract_preprocessing(preprocessor):
+    """Fitted ColumnTransformer state as (arrays, meta) for FeatureTransform."""
+    numeric_features, numeric_means = [], []
+    categorical_feature, categorical_fill, categories = None, None, None
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'num':
+            numeric_features = list(columns)
+            numeric_means = transformer.named_steps['imputer'].statistics_.astype(float)
+        elif name == 'cat':
+            categorical_feature = list(columns)[0]
+            categorical_fill = str(transformer.named_steps['imputer'].statistics_[0])
+            categories = transformer.named_steps['onehot'].categories_[0].astype(str)
+
+    arrays = {
+        'numeric_means': np.asarray(numeric_means, dtype=np.float64),
+        'categories': np.asarray(categories, dtype=str)
+    }
+    meta = {
+        'numeric_features': numeric_features,
+        'categorical_feature': categorical_feature,
+        'categorical_fill': categorical_fill,
+        # A sparse ColumnTransformer output means XGBoost saw zeros as missing values
+        'sparse_output': bool(getattr(preprocessor, 'sparse_output_', False))
+    }
+    return arrays, meta
+
+def compile_pipeline(pipeline):
+    """Flatten a fitted stage pipeline into (arrays, meta) for CompiledModel."""
+    booster = pipeline.named_steps['model'].get_booster()
+    arrays, meta = extract_preprocessing(pipeline.named_steps['preprocessor'])
+    trees, max_depth = _flatten_trees(booster)
+    arrays.update(trees)
+    meta.update(format_version=FORMAT_VERSION, base_score=_base_score(booster), max_depth=max_depth)
+    return arrays, meta
+
+def save_compiled(path, arrays, meta):
+    np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+class FeatureTransform:
+    """The pipeline's imputers and one-hot encoder replayed on plain arrays."""
+
+    def __init__(self, arrays, meta):
+        self.numeric_features = meta['numeric_features']
+        self.categorical_feature = meta['categorical_feature']
+        self.categorical_fill = meta['categorical_fill']
+        self.sparse_output = meta['sparse_output']
+        self.numeric_means = arrays['numeric_means']
+        self.categories = arrays['categories']
+        self.n_features = len(self.numeric_features) + len(self.categories)
+
+    def __call__(self, columns):
+        """Replicate the pipeline preprocessing on a mapping of column -> values."""
+        numeric = [np.atleast_1d(np.asarray(columns[name], dtype=np.float64)) for name in self.numeric_features]
+        category = np.atleast_1d(np.asarray(columns[self.categorical_feature], dtype=object))
+        n_rows = len(category)
+
+        X = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        for i, values in enumerate(numeric):
+            X[:, i] = np.where(np.isnan(values), self.numeric_means[i], values)
+
+        is_missing = np.equal(category, None) | (category != category)
+        category = np.where(is_missing, self.categorical_fill, category).astype(str)
+        position = np.searchsorted(self.categories, category)
+        position = np.minimum(position, len(self.categories) - 1)
+        known = self.categories[position] == category
+        rows = np.nonzero(known)[0]
+        X[rows, len(self.numeric_features) + position[known]] = 1.0
+
+        if self.sparse_output:
+            X[X == 0] = np.nan
+        return X
+
+class CompiledModel:
+    """Pure NumPy evaluator for a compiled stage pipeline."""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.transform = FeatureTransform(arrays, meta)
+        self.base_score = np.float32(meta['base_score'])
+        self.max_depth = meta['max_depth']
+
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.missing = arrays['missing']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+            arrays = {name: archive[name] for name in archive.files if name != 'meta'}
+            meta = json.loads(str(archive['meta']))
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+        return cls(arrays, meta)
+
+    def predict_matrix(self, X):
+        n_rows = X.shape[0]
+        row_index = np.arange(n_rows)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            feature = self.feature[node]
+            active = feature >= 0
+            if not active.any():
+                break
+            x = X[row_index, np.where(active, feature, 0)]
+            branch = np.where(x < self.threshold[node], self.left[node], self.right[node])
+            branch = np.where(np.isnan(x), self.missing[node], branch)
+            node = np.where(active, branch, node)
+        return self.value[node].sum(axis=1, dtype=np.float32) + self.base_score
+
+    def predict(self, columns):
+        """Score one row (mapping of scalars) or a batch (mapping of arrays / DataFrame)."""
+        return self.predict_matrix(self.transform(columns))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the stage pipelines into NumPy tree models.")
+    parser.add_argument('stages', nargs='*', help="Stage names or codes (A1-A5); all stages by default")
+    parser.add_argument('--check', action='store_true', help="Compare against the pipeline on the training data")
+    args = parser.parse_args(argv)
+
+    from scripts.modelRegistry import ModelRegistry
+
+    for stage_name in [resolve_stage(name) for name in args.stages] or STAGE_ORDER:
+        pipeline = ModelRegistry().get_model(stage_name)
+        arrays, meta = compile_pipeline(pipeline)
+        path = compiled_model_path(stage_name)
+        save_compiled(path, arrays, meta)
+        print(f"Compiled {STAGES[stage_name]['model_path']} -> {path} "
+              f"({len(arrays['roots'])} trees, {len(arrays['feature'])} nodes)")
+
+        if args.check:
+            from scripts import datasets
+            from scripts.stages import feature_columns
+
+            frame = datasets.load(STAGES[stage_name]['data_path'], columns=feature_columns(stage_name))
+            expected = pipeline.predict(frame)
+            actual = CompiledModel.load(path).predict(frame)
+            difference = np.abs(expected - actual)
+            print(f"  max abs difference {difference.max():.6f}, "
+                  f"max relative difference {(difference / np.maximum(np.abs(expected), 1e-6)).max():.2e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
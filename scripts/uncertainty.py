@@ -0,0 +1,224 @@
+"""Monte Carlo uncertainty of stage and project emissions.
+
+    python -m scripts.uncertainty project.json --samples 100000 --relative 0.1
+
+The project has the same formats as for scripts/engine.py (rows, column
+mappings or DataFrames per stage), except that any numeric input may be a
+distribution instead of a number:
+
+    {"dist": "normal", "mean": 100, "sd": 10}
+    {"dist": "lognormal", "mean": 0.9, "sd": 0.2}     # mean and sd of the value itself
+    {"dist": "uniform", "low": 80, "high": 120}
+    {"dist": "triangular", "low": 80, "mode": 100, "high": 150}
+
+Plain numbers are fixed, or normal with a standard deviation of --relative
+times the value. Samples are clipped at zero, since every input is a physical
+quantity. Missing fuel rates and carbon factors come from the stage tables.
+
+For each stage, the samples of its line items are drawn as arrays and scored
+in batches of at most MAX_BATCH_ROWS rows through the stage's scorer, which for
+'analytic' mode is the exact formula. Stages are sampled in parallel on the
+engine pool with independent random streams. The report gives the mean,
+percentiles and the probability of each totals-view band per stage and for the
+project.
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from scripts.encoding import build_features, encode, lookup_factors
+from scripts.engine import default_executor
+from scripts.modelRegistry import ModelRegistry
+from scripts.formula import ANALYTIC, SCORING_MODES, scoring_mode
+from scripts.stages import STAGES, STAGE_ORDER, SAFE_LIMIT, AVERAGE_LOWER, AVERAGE_LIMIT, resolve_stage, emission_level
+from scripts import telemetry
+
+DEFAULT_SAMPLES = 100000
+MAX_SAMPLES = 1000000
+MAX_BATCH_ROWS = 1000000
+PERCENTILES = (5, 50, 95)
+LEVELS = ('Safe', 'Average', 'Danger')
+FACTOR_COLUMNS = {'Fuel_consumption_rate': 0, 'Carbon_emission_factor': 1}
+
+def sample_input(spec, size, rng, relative=0.0):
+    """Draw size samples of one input described by a number or a distribution object."""
+    if isinstance(spec, dict):
+        kind = spec.get('dist', 'normal')
+        if kind == 'fixed':
+            samples = np.full(size, float(spec['value']))
+        elif kind == 'normal':
+            samples = rng.normal(float(spec['mean']), float(spec['sd']), size)
+        elif kind == 'lognormal':
+            mean, sd = float(spec['mean']), float(spec['sd'])
+            sigma2 = np.log1p((sd / mean) ** 2)
+            samples = rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), size)
+        elif kind == 'uniform':
+            samples = rng.uniform(float(spec['low']), float(spec['high']), size)
+        elif kind == 'triangular':
+            samples = rng.triangular(float(spec['low']), float(spec['mode']), float(spec['high']), size)
+        else:
+            raise ValueError(f"Unknown distribution: {kind}")
+    else:
+        value = float(spec)
+        if relative > 0 and value != 0:
+            samples = rng.normal(value, abs(value) * relative, size)
+        else:
+            samples = np.full(size, value)
+    return np.maximum(samples, 0.0)
+
+def line_items(items):
+    """Line items as row dicts, from any of the engine's formats: rows, a column mapping or a DataFrame."""
+    if isinstance(items, list):
+        return items
+    return pd.DataFrame(items).to_dict('records')
+
+def _missing(spec):
+    return spec is None or (not isinstance(spec, dict) and pd.isna(spec))
+
+def item_inputs(stage_name, item):
+    """The item's input specs per numeric column, with missing factors from the stage table."""
+    stage = STAGES[stage_name]
+    category = item.get(stage['categorical_feature'])
+    factors = lookup_factors(stage_name, encode(stage_name, [category]))
+    inputs = {}
+    for column in stage['numeric_features']:
+        spec = item.get(column)
+        if _missing(spec) and column in FACTOR_COLUMNS:
+            spec = float(factors[FACTOR_COLUMNS[column]][0])
+        if _missing(spec):
+            raise ValueError(f"{stage_name} item {category}: {column} is missing")
+        inputs[column] = spec
+    return category, inputs
+
+def batches(n_items, samples, rows=MAX_BATCH_ROWS):
+    """Lazy item-major batches of (item, first sample, count) pieces, at most rows rows each."""
+    batch, filled = [], 0
+    for item in range(n_items):
+        start = 0
+        while start < samples:
+            size = min(samples - start, rows - filled)
+            batch.append((item, start, size))
+            filled += size
+            start += size
+            if filled == rows:
+                yield batch
+                batch, filled = [], 0
+    if batch:
+        yield batch
+
+def sample_stage(stage_name, items, samples=DEFAULT_SAMPLES, rng=None, relative=0.0, mode=None):
+    """Emission samples of a stage: the sum over its items of every sampled prediction."""
+    rng = rng or np.random.default_rng()
+    items = line_items(items)
+    emissions = np.zeros(samples)
+    if not items:
+        return emissions
+    with telemetry.span('uncertainty', stage=stage_name):
+        stage = STAGES[stage_name]
+        parsed = [item_inputs(stage_name, item) for item in items]
+        mode = mode or scoring_mode(stage_name)
+        model = ModelRegistry().get_scorer(stage_name, mode)
+
+        # Only one batch of samples exists at a time, so memory stays bounded by MAX_BATCH_ROWS
+        for batch in batches(len(parsed), samples):
+            columns = {column: np.concatenate([sample_input(parsed[item][1][column], size, rng, relative)
+                                               for item, _, size in batch])
+                       for column in stage['numeric_features']}
+            if mode == ANALYTIC:
+                # The formula only needs the numeric columns, so the category frame is skipped entirely
+                predictions = model.predict(columns)
+            else:
+                columns[stage['categorical_feature']] = np.concatenate(
+                    [np.full(size, parsed[item][0], dtype=object) for item, _, size in batch])
+                predictions = telemetry.predict(model, build_features(stage_name, columns), stage=stage_name)
+
+            predictions = np.asarray(predictions, dtype=float)
+            offset = 0
+            for item, start, size in batch:
+                emissions[start:start + size] += predictions[offset:offset + size]
+                offset += size
+        return emissions
+
+def level_probabilities(emissions):
+    """Share of samples in each totals-view band (see scripts/stages.py emission_level)."""
+    tonnes = np.asarray(emissions) / 1000
+    safe = tonnes <= SAFE_LIMIT
+    average = (tonnes > AVERAGE_LOWER) & (tonnes <= AVERAGE_LIMIT)
+    return {'Safe': float(safe.mean()), 'Average': float(average.mean()),
+            'Danger': float(1.0 - safe.mean() - average.mean())}
+
+def summarize(emissions, percentiles=PERCENTILES):
+    mean = float(emissions.mean())
+    return {
+        'mean': mean,
+        'std': float(emissions.std()),
+        'level': emission_level(mean / 1000)[0],
+        'percentiles': {f"{p:g}": float(v) for p, v in zip(percentiles, np.percentile(emissions, percentiles))},
+        'levels': level_probabilities(emissions)
+    }
+
+def simulate(project, samples=DEFAULT_SAMPLES, relative=0.0, seed=None, mode=None, percentiles=PERCENTILES,
+             executor=None):
+    """Sample every stage of a project in parallel; returns per-stage and total summaries."""
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+    executor = executor or default_executor()
+    stage_items = {resolve_stage(name): items for name, items in project.items()}
+    streams = np.random.SeedSequence(seed).spawn(len(STAGE_ORDER))
+    futures = {
+        stage_name: executor.submit(sample_stage, stage_name, stage_items[stage_name], samples,
+                                    np.random.default_rng(stream), relative, mode)
+        for stage_name, stream in zip(STAGE_ORDER, streams) if stage_name in stage_items
+    }
+
+    total = np.zeros(samples)
+    stages = {}
+    for stage_name in STAGE_ORDER:
+        if stage_name not in futures:
+            continue
+        emissions = futures[stage_name].result()
+        total += emissions
+        stages[stage_name] = summarize(emissions, percentiles)
+    return {'samples': samples, 'stages': stages, 'total': summarize(total, percentiles)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo uncertainty of a project's emissions.")
+    parser.add_argument('project', help="JSON object mapping stage names or codes to lists of line items")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="Samples per stage")
+    parser.add_argument('--relative', type=float, default=0.0,
+                        help="Relative standard deviation given to inputs that are plain numbers")
+    parser.add_argument('--seed', type=int, help="Random seed, for reproducible results")
+    parser.add_argument('--percentiles', default=','.join(str(p) for p in PERCENTILES),
+                        help="Comma-separated percentiles to report")
+    parser.add_argument('--mode', choices=SCORING_MODES,
+                        help="Scoring mode for every stage; CARBON_SCORING_MODE or the stage default otherwise")
+    parser.add_argument('--output', help="Write the result as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with open(args.project, 'r') as file:
+        project = json.load(file)
+    percentiles = tuple(float(p) for p in args.percentiles.split(','))
+
+    started = time.perf_counter()
+    result = simulate(project, args.samples, args.relative, args.seed, args.mode, percentiles)
+    elapsed = time.perf_counter() - started
+
+    def describe(summary):
+        spread = ', '.join(f"P{p} {v:.2f}" for p, v in summary['percentiles'].items())
+        bands = ', '.join(f"{level} {summary['levels'][level]:.1%}" for level in LEVELS)
+        return f"mean {summary['mean']:.2f} kgCO2e ({spread}) - {bands}"
+
+    for stage_name, summary in result['stages'].items():
+        print(f"{STAGES[stage_name]['code']} {stage_name}: {describe(summary)}")
+    print(f"Total: {describe(result['total'])}")
+    print(f"{args.samples} samples per stage in {elapsed:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
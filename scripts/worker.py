@@ -0,0 +1,146 @@
+from scripts.packages import QObject, QRunnable, QThreadPool, QProgressBar, QMessageBox, Signal
+from scripts.modelRegistry import ModelRegistry
+
+class WorkerSignals(QObject):
+    result = Signal(int, object)
+    error = Signal(int, str)
+
+class Task(QRunnable):
+    def __init__(self, request_id, fn, signals):
+        super().__init__()
+        # Kept alive by the runner, so Qt must not delete it after run()
+        self.setAutoDelete(False)
+        self.request_id = request_id
+        self.fn = fn
+        self.signals = signals
+
+    def run(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            self.emit(self.signals.error, str(e))
+            return
+        self.emit(self.signals.result, value)
+
+    def emit(self, signal, value):
+        try:
+            signal.emit(self.request_id, value)
+        except RuntimeError:
+            # The dialog that submitted the task was closed and deleted meanwhile
+            pass
+
+class PredictionRunner(QObject):
+    """Run model work on the global QThreadPool and deliver only the latest result.
+
+    Submitting a new request makes any earlier one stale: if it has not started
+    yet it is taken off the pool queue, otherwise its result is dropped when it
+    arrives. Callbacks always run on the GUI thread.
+    """
+    busy_changed = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool.globalInstance()
+        self.signals = WorkerSignals(self)
+        self.signals.result.connect(self.on_result)
+        self.signals.error.connect(self.on_error)
+        self.request_id = 0
+        self.pending = {}
+        self.callbacks = None
+
+    def submit(self, fn, on_result, on_error=None):
+        self.cancel()
+        self.request_id += 1
+        task = Task(self.request_id, fn, self.signals)
+        self.pending[self.request_id] = task
+        self.callbacks = (self.request_id, on_result, on_error)
+        self.pool.start(task)
+        self.busy_changed.emit(True)
+        return self.request_id
+
+    def cancel(self):
+        for request_id, task in list(self.pending.items()):
+            if self.pool.tryTake(task):
+                del self.pending[request_id]
+        if self.callbacks is not None:
+            self.callbacks = None
+            self.busy_changed.emit(False)
+
+    def is_busy(self):
+        return self.callbacks is not None
+
+    def on_result(self, request_id, value):
+        callback = self.finish(request_id)
+        if callback is not None and callback[0] is not None:
+            callback[0](value)
+
+    def on_error(self, request_id, message):
+        callback = self.finish(request_id)
+        if callback is not None and callback[1] is not None:
+            callback[1](message)
+
+    def finish(self, request_id):
+        self.pending.pop(request_id, None)
+        if self.callbacks is None or self.callbacks[0] != request_id:
+            return None
+        _, on_result, on_error = self.callbacks
+        self.callbacks = None
+        self.busy_changed.emit(False)
+        return on_result, on_error
+
+def create_busy_indicator(parent=None):
+    """Indeterminate progress bar shown while a runner is busy."""
+    indicator = QProgressBar(parent)
+    indicator.setRange(0, 0)
+    indicator.setTextVisible(False)
+    indicator.setMaximumHeight(6)
+    indicator.hide()
+    return indicator
+
+class StageDialogMixin:
+    """Model loading and prediction runners shared by the stage dialogs.
+
+    The dialog builds its predict_button, busy_indicator and result_label, then
+    calls start_runners. Predict stays disabled until the stage model is in the
+    shared registry, where predict_stage then finds it.
+    """
+    def start_runners(self, stage_name):
+        self.stage_name = stage_name
+        self.model_loader = PredictionRunner(self)
+        self.predictor = PredictionRunner(self)
+        self.predictor.busy_changed.connect(self.busy_indicator.setVisible)
+        self.predict_button.setEnabled(False)
+        self.load_model()
+
+    def load_model(self):
+        # Unpickle on the thread pool so a slow disk does not freeze the dialog
+        stage_name = self.stage_name
+        self.model_loader.submit(lambda: ModelRegistry().get_scorer(stage_name),
+                                 self.on_model_loaded, self.on_model_error)
+
+    def on_model_loaded(self, model):
+        self.predict_button.setEnabled(True)
+
+    def on_model_error(self, message):
+        QMessageBox.critical(self, "Model Error", f"Error loading model: {message}")
+        # Predict fetches the model again and reports the error if it still fails
+        self.predict_button.setEnabled(True)
+
+    def show_prediction_error(self, message):
+        QMessageBox.critical(self, "Prediction Error", f"An error occurred during prediction: {message}")
+
+    def get_prediction(self):
+        return getattr(self, 'predicted_emission', 0)
+
+    def reset_inputs(self):
+        """Clear the form for a fresh start when the dialog is reopened."""
+        self.predictor.cancel()
+        self.clear_inputs()
+        self.result_label.clear()
+        sweep_window = getattr(self, 'sweep_window', None)
+        if sweep_window is not None:
+            sweep_window.close()
+
+    def clear_inputs(self):
+        """Reset the dialog's own input widgets; implemented by each dialog."""
+        raise NotImplementedError
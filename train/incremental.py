@@ -0,0 +1,218 @@
+"""Incremental training: continue the published boosters on newly appended rows.
+
+    python -m train.trainer --incremental                 # every stage with new rows
+    python -m train.trainer A1 --incremental --trees 30 --max-regression 0.01
+
+The ledger (models/training-ledger.json) records per stage how many leading
+rows of the dataset the published model has consumed, a hash of those rows,
+the row batches it was trained in and every published version. Rows added at
+the end of the dataset since then are split like a full training run: the
+training part is fed to XGBoost as additional trees on top of the existing
+booster (xgb_model continuation), keeping the fitted preprocessor, and the
+test part joins the holdout. The holdout is the test split of every batch, so
+the model has never seen it. A new version is published only if its holdout
+error is at most --max-regression worse than the current model's; otherwise
+the rows stay unconsumed and are retried with the next batch. The rejected
+batch is recorded as pending, so it keeps its split and its test rows are never
+trained on in a later run. Before the first replacement, the live model is kept
+under models/versions as well.
+
+Datasets that changed other than by appending rows need a full retrain.
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+from scripts.stages import STAGES
+from scripts.artifact import save_artifact
+from train.trainer import (load_dataset, split_dataset, file_hash, spec_hash, load_manifest, save_manifest)
+
+LEDGER_PATH = 'models/training-ledger.json'
+VERSIONS_DIR = 'models/versions'
+
+def load_ledger():
+    try:
+        with open(LEDGER_PATH, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def save_ledger(ledger):
+    with open(LEDGER_PATH, 'w') as file:
+        json.dump(ledger, file, indent=2, sort_keys=True)
+
+def rows_hash(df, rows):
+    """Content hash of the first rows of a dataset, to detect edits before the consumed point."""
+    hashes = pd.util.hash_pandas_object(df.iloc[:rows], index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+def holdout(df, batches, spec):
+    """Test split of every batch: rows none of the published versions were trained on."""
+    parts = [split_dataset(df.iloc[start:end], spec) for start, end in batches]
+    return pd.concat([part[1] for part in parts]), pd.concat([part[3] for part in parts])
+
+def version_path(spec, version):
+    name = os.path.splitext(os.path.basename(spec['model_path']))[0]
+    return os.path.join(VERSIONS_DIR, f"{name}-v{version}.pkl")
+
+def publish(stage_name, spec, pipeline, version):
+    """Keep the version's pickle and make it the live pipeline and artifact."""
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    path = version_path(spec, version)
+    with open(path, 'wb') as file:
+        pickle.dump(pipeline, file)
+    temporary_path = f"{spec['model_path']}.tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(pipeline, file)
+    os.replace(temporary_path, spec['model_path'])
+    save_artifact(stage_name, pipeline, os.path.splitext(spec['model_path'])[0])
+    return path
+
+def record_full_training(ledger, stage_name, spec, mse):
+    """Reset a stage's ledger after a from-scratch training on the whole dataset."""
+    df = load_dataset(spec['data_path'])
+    versions = ledger.get(stage_name, {}).get('versions', [])
+    ledger[stage_name] = {
+        'rows': int(len(df)),
+        'rows_hash': rows_hash(df, len(df)),
+        'batches': [[0, int(len(df))]],
+        'versions': versions + [{
+            'version': len(versions) + 1,
+            'kind': 'full',
+            'rows': int(len(df)),
+            'holdout_mse': float(mse),
+            'published_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }]
+    }
+
+def snapshot(spec, entry, current, current_mse):
+    """Keep the live model under models/versions before it is replaced; returns the ledger's versions.
+
+    A model trained before the ledger existed becomes version 1 ('baseline').
+    """
+    versions = entry['versions']
+    if not versions:
+        trained_at = time.localtime(os.path.getmtime(spec['model_path']))
+        versions = [{
+            'version': 1,
+            'kind': 'baseline',
+            'rows': entry['rows'],
+            'holdout_mse': current_mse,
+            'published_at': time.strftime('%Y-%m-%dT%H:%M:%S', trained_at)
+        }]
+    path = version_path(spec, versions[-1]['version'])
+    if not os.path.exists(path):
+        os.makedirs(VERSIONS_DIR, exist_ok=True)
+        with open(path, 'wb') as file:
+            pickle.dump(current, file)
+    return versions
+
+def continue_stage(stage_name, spec, entry, trees=20, max_regression=0.01, min_rows=10, n_jobs=-1):
+    """Add trees for the rows appended since entry['rows']; returns (result, new ledger entry or None).
+
+    A rejected candidate still returns an entry: its batch is kept as pending,
+    so the rows it held out stay in the holdout when they are retried.
+    """
+    started = time.perf_counter()
+    df = load_dataset(spec['data_path'])
+    consumed = entry['rows']
+    if len(df) < consumed or rows_hash(df, consumed) != entry['rows_hash']:
+        raise ValueError(f"{spec['data_path']} changed before row {consumed}; run a full training instead")
+    pending = entry.get('pending', [])
+    start = pending[-1][1] if pending else consumed
+    if len(df) < start:
+        raise ValueError(f"{spec['data_path']} lost rows of a pending batch; run a full training instead")
+    appended = len(df) - start
+    if appended < min_rows:
+        return {'stage': stage_name, 'status': 'skipped', 'rows': appended,
+                'reason': f"{appended} new rows, fewer than {min_rows}"}, None
+
+    with open(spec['model_path'], 'rb') as file:
+        current = pickle.load(file)
+    preprocessor = current.named_steps['preprocessor']
+
+    # Earlier rejected batches keep their bounds, and so their train/test split
+    new_batches = pending + [[start, len(df)]]
+    train_parts = [split_dataset(df.iloc[first:last], spec) for first, last in new_batches]
+    X_train = pd.concat([part[0] for part in train_parts])
+    y_train = pd.concat([part[2] for part in train_parts])
+    # The preprocessor keeps its fitted layout so the new trees see the same features as the old ones
+    hyperparameters = dict(spec['hyperparameters'], n_estimators=trees)
+    model = XGBRegressor(n_jobs=n_jobs, **hyperparameters)
+    model.fit(preprocessor.transform(X_train), y_train, xgb_model=current.named_steps['model'].get_booster())
+    candidate = Pipeline(steps=[('preprocessor', preprocessor), ('model', model)])
+
+    batches = entry['batches'] + new_batches
+    X_holdout, y_holdout = holdout(df, batches, spec)
+    current_mse = float(mean_squared_error(y_holdout, current.predict(X_holdout)))
+    candidate_mse = float(mean_squared_error(y_holdout, candidate.predict(X_holdout)))
+    result = {
+        'stage': stage_name,
+        'rows': len(df) - consumed,
+        'holdout_rows': int(len(y_holdout)),
+        'current_mse': current_mse,
+        'mse': candidate_mse,
+        'seconds': time.perf_counter() - started
+    }
+    if candidate_mse > current_mse * (1 + max_regression):
+        result.update(status='rejected', reason=f"holdout MSE {candidate_mse:.2f} > {current_mse:.2f}")
+        return result, dict(entry, pending=new_batches)
+
+    versions = snapshot(spec, entry, current, current_mse)
+    version = len(versions) + 1
+    path = publish(stage_name, spec, candidate, version)
+    result.update(status='published', version=version, path=path)
+    return result, {
+        'rows': int(len(df)),
+        'rows_hash': rows_hash(df, len(df)),
+        'batches': batches,
+        'versions': versions + [{
+            'version': version,
+            'kind': 'incremental',
+            'rows': int(len(df)),
+            'trees': int(model.get_booster().num_boosted_rounds()),
+            'holdout_mse': candidate_mse,
+            'previous_mse': current_mse,
+            'published_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }]
+    }
+
+def initial_entry(stage_name, spec, manifest, consumed_rows=None):
+    """Ledger entry for a model trained before the ledger existed."""
+    rows = consumed_rows or manifest.get(stage_name, {}).get('rows')
+    if rows is None:
+        raise ValueError(f"No record of the rows behind {spec['model_path']}; "
+                         f"run a full training first or pass --consumed-rows")
+    df = load_dataset(spec['data_path'])
+    return {'rows': int(rows), 'rows_hash': rows_hash(df, rows), 'batches': [[0, int(rows)]], 'versions': []}
+
+def run_incremental(stage_names, specs, args):
+    ledger = load_ledger()
+    manifest = load_manifest()
+    results = []
+    for stage_name in stage_names:
+        spec = specs[stage_name]
+        code = STAGES[stage_name]['code']
+        entry = ledger.get(stage_name) or initial_entry(stage_name, spec, manifest, args.consumed_rows)
+        result, updated = continue_stage(stage_name, spec, entry, args.trees, args.max_regression, args.min_rows)
+        results.append(result)
+
+        if updated is not None:
+            ledger[stage_name] = updated
+            save_ledger(ledger)
+        if result['status'] != 'published':
+            print(f"{code} {stage_name}: {result['status']}, {result['reason']}")
+            continue
+        # The live model now matches the current data, so a plain trainer run skips the stage
+        manifest[stage_name] = dict(manifest.get(stage_name, {}), data_hash=file_hash(spec['data_path']),
+                                    spec_hash=spec_hash(spec), mse=result['mse'], rows=updated['rows'],
+                                    version=result['version'], trained_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        save_manifest(manifest)
+        print(f"{code} {stage_name}: v{result['version']} published, +{result['rows']} rows, holdout MSE "
+              f"{result['current_mse']:.2f} -> {result['mse']:.2f} ({result['seconds']:.1f}s) -> {result['path']}")
+    return results
@@ -0,0 +1,297 @@
+"""Train all stage models from one command.
+
+    python -m train.trainer                 # retrain stages whose data or spec changed
+    python -m train.trainer A1 A3 --force   # retrain selected stages unconditionally
+    python -m train.trainer --spec spec.json --jobs 5
+
+Each stage is described by a declarative spec (features, target formula,
+hyperparameters) built from scripts/stages.py; --spec merges overrides from a
+JSON file keyed by stage name or code. Stages are trained in parallel worker
+processes. Datasets are memory-mapped from the columnar cache
+(scripts/datasets.py), fitted preprocessors are cached under .cache/, and a
+stage is skipped when the hashes of its data and spec match the ones recorded
+in models/training-manifest.json. Each trained stage is written both as the
+pickled pipeline and as a pickle-free artifact (scripts/artifact.py).
+
+--tune searches hyperparameters instead of training (see train/tuner.py) and
+can write the chosen hyperparameters to a spec file for the next training run. --incremental
+adds trees for newly appended rows to the published models instead of
+retraining them (see train/incremental.py).
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_squared_error
+import sklearn
+import xgboost
+from xgboost import XGBRegressor
+from scripts.stages import STAGES, STAGE_ORDER, resolve_stage
+from scripts import datasets
+from scripts.artifact import save_artifact
+
+CACHE_DIR = '.cache'
+MANIFEST_PATH = 'models/training-manifest.json'
+
+DEFAULT_HYPERPARAMETERS = {
+    'n_estimators': 100,
+    'learning_rate': 0.5,
+    'max_depth': 5,
+    'subsample': 1,
+    'colsample_bytree': 0.5
+}
+
+def default_specs():
+    return {
+        stage_name: {
+            'data_path': stage['data_path'],
+            'model_path': stage['model_path'],
+            'categorical_feature': stage['categorical_feature'],
+            'numeric_features': list(stage['numeric_features']),
+            'target_product': list(stage['target_product']),
+            'hyperparameters': dict(DEFAULT_HYPERPARAMETERS),
+            'test_size': 0.2,
+            'random_state': 42
+        }
+        for stage_name, stage in STAGES.items()
+    }
+
+def load_specs(path=None):
+    specs = default_specs()
+    if path:
+        with open(path, 'r') as file:
+            overrides = json.load(file)
+        for name, override in overrides.items():
+            spec = specs[resolve_stage(name)]
+            hyperparameters = override.pop('hyperparameters', {})
+            spec.update(override)
+            spec['hyperparameters'].update(hyperparameters)
+    return specs
+
+def file_hash(path):
+    """Content hash of a data file, taken from (and kept current in) the columnar cache."""
+    return datasets.ensure(path)['sha256']
+
+def spec_hash(spec):
+    # Library versions are part of the spec: a new sklearn/xgboost means a retrain
+    payload = dict(spec, sklearn=sklearn.__version__, xgboost=xgboost.__version__)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def cached_pickle(path, build):
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    value = build()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(value, file)
+    os.replace(temporary_path, path)
+    return value
+
+def load_dataset(data_path):
+    """Memory-map the training data from the columnar cache, converting the CSV on first use."""
+    return datasets.load(data_path)
+
+def build_preprocessor(spec):
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean'))
+    ])
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore'))
+    ])
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, spec['numeric_features']),
+            ('cat', categorical_transformer, [spec['categorical_feature']])
+        ])
+
+def split_dataset(df, spec):
+    X = df[spec['numeric_features'] + [spec['categorical_feature']]]
+    y = df[spec['target_product']].prod(axis=1)
+    return train_test_split(X, y, test_size=spec['test_size'], random_state=spec['random_state'])
+
+def fit_preprocessor(spec, data_hash, X_train):
+    """Fit the ColumnTransformer, reusing the cached one for the same data and preprocessing spec."""
+    key = hashlib.sha256(json.dumps({
+        'data': data_hash,
+        'numeric_features': spec['numeric_features'],
+        'categorical_feature': spec['categorical_feature'],
+        'test_size': spec['test_size'],
+        'random_state': spec['random_state'],
+        'sklearn': sklearn.__version__
+    }, sort_keys=True).encode()).hexdigest()
+    return cached_pickle(os.path.join(CACHE_DIR, 'preprocessors', f"{key}.pkl"),
+                         lambda: build_preprocessor(spec).fit(X_train))
+
+def train_stage(stage_name, spec, data_hash, n_jobs):
+    started = time.perf_counter()
+    df = load_dataset(spec['data_path'])
+    X_train, X_test, y_train, y_test = split_dataset(df, spec)
+
+    preprocessor = fit_preprocessor(spec, data_hash, X_train)
+    model = XGBRegressor(n_jobs=n_jobs, **spec['hyperparameters'])
+    model.fit(preprocessor.transform(X_train), y_train)
+
+    # Same layout as the pipelines the dialogs have always loaded
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('model', model)])
+    mse = mean_squared_error(y_test, pipeline.predict(X_test))
+
+    temporary_path = f"{spec['model_path']}.tmp"
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(pipeline, file)
+    os.replace(temporary_path, spec['model_path'])
+    save_artifact(stage_name, pipeline, os.path.splitext(spec['model_path'])[0])
+
+    return {
+        'stage': stage_name,
+        'mse': float(mse),
+        'rows': int(len(df)),
+        'seconds': time.perf_counter() - started
+    }
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+def run(stage_names, specs, jobs=None, force=False):
+    manifest = load_manifest()
+    pending = {}
+    for stage_name in stage_names:
+        spec = specs[stage_name]
+        hashes = {'data_hash': file_hash(spec['data_path']), 'spec_hash': spec_hash(spec)}
+        recorded = manifest.get(stage_name, {})
+        unchanged = all(recorded.get(key) == value for key, value in hashes.items())
+        if unchanged and os.path.exists(spec['model_path']) and not force:
+            print(f"{STAGES[stage_name]['code']} {stage_name}: unchanged, skipped")
+            continue
+        pending[stage_name] = hashes
+
+    if not pending:
+        return []
+
+    jobs = jobs or min(len(pending), os.cpu_count() or 1)
+    # Split the cores between the stage processes instead of oversubscribing them
+    threads_per_stage = max(1, (os.cpu_count() or 1) // jobs)
+
+    from train.incremental import load_ledger, save_ledger, record_full_training
+    ledger = load_ledger()
+
+    results, failures = [], {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            stage_name: executor.submit(train_stage, stage_name, specs[stage_name],
+                                        hashes['data_hash'], threads_per_stage)
+            for stage_name, hashes in pending.items()
+        }
+        for stage_name, future in futures.items():
+            # A failed stage must not keep the finished ones out of the manifest, or they would be retrained
+            try:
+                result = future.result()
+            except Exception as e:
+                failures[stage_name] = e
+                print(f"{STAGES[stage_name]['code']} {stage_name}: failed: {e}")
+                continue
+            manifest[stage_name] = dict(pending[stage_name], mse=result['mse'], rows=result['rows'],
+                                        trained_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+            save_manifest(manifest)
+            record_full_training(ledger, stage_name, specs[stage_name], result['mse'])
+            save_ledger(ledger)
+            print(f"{STAGES[stage_name]['code']} {stage_name}: Mean Squared Error {result['mse']:.2f} "
+                  f"({result['rows']} rows, {result['seconds']:.1f}s) -> {specs[stage_name]['model_path']}")
+            results.append(result)
+
+    if failures:
+        codes = ', '.join(STAGES[stage_name]['code'] for stage_name in failures)
+        raise RuntimeError(f"Training failed for {codes}") from next(iter(failures.values()))
+    return results
+
+def tune(stage_names, specs, args):
+    from train.tuner import tune_stage
+
+    tuned = {}
+    for stage_name in stage_names:
+        spec = specs[stage_name]
+        data_hash = file_hash(spec['data_path'])
+        df = load_dataset(spec['data_path'])
+        X_train, _, y_train, _ = split_dataset(df, spec)
+        preprocessor = fit_preprocessor(spec, data_hash, X_train)
+        result = tune_stage(stage_name, spec, preprocessor.transform(X_train), y_train, args)
+        tuned[STAGES[stage_name]['code']] = {'hyperparameters': result['hyperparameters']}
+
+    if args.write_spec:
+        existing = {}
+        if os.path.exists(args.write_spec):
+            with open(args.write_spec, 'r') as file:
+                existing = json.load(file)
+        existing.update(tuned)
+        with open(args.write_spec, 'w') as file:
+            json.dump(existing, file, indent=2)
+        print(f"Wrote tuned hyperparameters to {args.write_spec}")
+    return tuned
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the stage models in parallel.")
+    parser.add_argument('stages', nargs='*', help="Stage names or codes (A1-A5); all stages by default")
+    parser.add_argument('--spec', help="JSON file with per-stage overrides of the default spec")
+    parser.add_argument('--jobs', type=int, help="Number of stages trained at once")
+    parser.add_argument('--force', action='store_true', help="Retrain even if data and spec are unchanged")
+    parser.add_argument('--compile', action='store_true', help="Export NumPy tree models after training")
+    parser.add_argument('--tune', action='store_true', help="Search hyperparameters instead of training")
+    parser.add_argument('--trials', type=int, default=27, help="Tuning: number of sampled candidates")
+    parser.add_argument('--eta', type=int, default=3, help="Tuning: keep 1/eta of the candidates per round")
+    parser.add_argument('--max-trees', type=int, default=400, help="Tuning: largest tree budget")
+    parser.add_argument('--folds', type=int, default=3, help="Tuning: cross-validation folds")
+    parser.add_argument('--seed', type=int, default=0, help="Tuning: random seed")
+    parser.add_argument('--rmse-tolerance', type=float, default=0.01,
+                        help="Tuning: relative RMSE above the best that the cheapest candidate may have")
+    parser.add_argument('--write-spec', help="Tuning: JSON spec file to write the chosen hyperparameters to")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Add trees for newly appended rows to the published models")
+    parser.add_argument('--trees', type=int, default=20, help="Incremental: trees added per update")
+    parser.add_argument('--max-regression', type=float, default=0.01,
+                        help="Incremental: largest relative holdout MSE increase that is still published")
+    parser.add_argument('--min-rows', type=int, default=10, help="Incremental: fewest new rows worth an update")
+    parser.add_argument('--consumed-rows', type=int,
+                        help="Incremental: rows behind a model trained before the ledger existed")
+    args = parser.parse_args(argv)
+
+    specs = load_specs(args.spec)
+    stage_names = [resolve_stage(name) for name in args.stages] or STAGE_ORDER
+    if args.tune:
+        tune(stage_names, specs, args)
+        return 0
+    if args.incremental:
+        from train.incremental import run_incremental
+        published = [result['stage'] for result in run_incremental(stage_names, specs, args)
+                     if result['status'] == 'published']
+        if args.compile and published:
+            from scripts.treeModel import main as compile_models
+            compile_models(published)
+        return 0
+    results = run(stage_names, specs, args.jobs, args.force)
+
+    if args.compile and results:
+        from scripts.treeModel import main as compile_models
+        compile_models([result['stage'] for result in results])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Hyperparameter search for the stage boosters.
+
+    python -m train.trainer --tune A1 --trials 40 --write-spec tuned.json
+    python -m train.trainer --spec tuned.json --force
+
+Candidates are sampled at random from SEARCH_SPACE and narrowed down by
+successive halving: every round evaluates the survivors with K-fold
+cross-validation and XGBoost early stopping at a larger tree budget, then
+keeps the best 1/eta. Trials run in a process pool. Every candidate is reported
+at the largest budget it reached with its accuracy and inference cost (trees
+used, per-row predict time, model size), and the Pareto front is taken over all
+of them. The winner is the cheapest candidate whose RMSE is within
+--rmse-tolerance of the best one, so a smaller booster is picked when it is as
+accurate.
+"""
+import os
+import time
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import KFold
+from sklearn.metrics import mean_squared_error
+from xgboost import XGBRegressor
+from scripts.stages import STAGES
+
+SEARCH_SPACE = {
+    'max_depth': [2, 3, 4, 5, 6, 8],
+    'learning_rate': (0.02, 0.5),
+    'subsample': (0.6, 1.0),
+    'colsample_bytree': (0.3, 1.0),
+    'min_child_weight': [1, 2, 5, 10]
+}
+
+_worker_data = {}
+
+def sample_candidates(n_trials, seed):
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n_trials):
+        candidate = {}
+        for name, space in SEARCH_SPACE.items():
+            if isinstance(space, list):
+                candidate[name] = space[rng.integers(len(space))]
+            elif name == 'learning_rate':
+                low, high = np.log(space[0]), np.log(space[1])
+                candidate[name] = float(np.exp(rng.uniform(low, high)))
+            else:
+                candidate[name] = float(rng.uniform(*space))
+        candidate['max_depth'] = int(candidate['max_depth'])
+        candidate['min_child_weight'] = int(candidate['min_child_weight'])
+        candidates.append(candidate)
+    return candidates
+
+def _init_worker(X, y, folds):
+    _worker_data.update(X=X, y=y, folds=folds)
+
+def _model_size(booster):
+    try:
+        return len(booster.save_raw(raw_format='ubj'))
+    except TypeError:
+        return len(booster.save_raw())
+
+def evaluate_candidate(params, n_estimators, early_stopping_rounds, n_jobs):
+    """Cross-validate one candidate at the given tree budget (runs in a worker process)."""
+    X, y, folds = _worker_data['X'], _worker_data['y'], _worker_data['folds']
+    scores, trees, sizes, predict_times = [], [], [], []
+    for train_index, valid_index in folds:
+        model = XGBRegressor(n_estimators=n_estimators, early_stopping_rounds=early_stopping_rounds,
+                             n_jobs=n_jobs, **params)
+        model.fit(X[train_index], y[train_index], eval_set=[(X[valid_index], y[valid_index])], verbose=False)
+
+        started = time.perf_counter()
+        predictions = model.predict(X[valid_index])
+        predict_times.append((time.perf_counter() - started) / len(valid_index))
+
+        scores.append(mean_squared_error(y[valid_index], predictions) ** 0.5)
+        trees.append(model.best_iteration + 1)
+        sizes.append(_model_size(model.get_booster()))
+
+    return {
+        'params': params,
+        'budget': n_estimators,
+        'rmse': float(np.mean(scores)),
+        'rmse_std': float(np.std(scores)),
+        'trees': int(np.ceil(np.mean(trees))),
+        'predict_us_per_row': float(np.mean(predict_times) * 1e6),
+        'model_bytes': int(np.mean(sizes))
+    }
+
+def successive_halving(X, y, n_trials=27, eta=3, min_budget=20, max_budget=400, folds=3,
+                       early_stopping_rounds=20, jobs=None, seed=0):
+    """Return every evaluated trial, best last-round candidates first."""
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=seed).split(X))
+    candidates = sample_candidates(n_trials, seed)
+    jobs = jobs or os.cpu_count() or 1
+    threads_per_trial = max(1, (os.cpu_count() or 1) // jobs)
+
+    history = []
+    budget = min_budget
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(X, y, splits)) as executor:
+        while True:
+            futures = [executor.submit(evaluate_candidate, params, budget, early_stopping_rounds, threads_per_trial)
+                       for params in candidates]
+            results = sorted((future.result() for future in futures), key=lambda trial: trial['rmse'])
+            history.extend(results)
+            print(f"  budget {budget:4d} trees: {len(results)} candidates, best RMSE {results[0]['rmse']:.3f}")
+
+            if len(results) <= 1 or budget >= max_budget:
+                return results + [trial for trial in history if trial not in results]
+            candidates = [trial['params'] for trial in results[:max(1, len(results) // eta)]]
+            budget = min(max_budget, budget * eta)
+
+def pareto_front(trials):
+    """Trials not beaten on both RMSE and per-row predict time by another trial."""
+    front = []
+    for trial in trials:
+        dominated = any(
+            other['rmse'] <= trial['rmse'] and other['predict_us_per_row'] <= trial['predict_us_per_row']
+            and (other['rmse'] < trial['rmse'] or other['predict_us_per_row'] < trial['predict_us_per_row'])
+            for other in trials
+        )
+        if not dominated:
+            front.append(trial)
+    return front
+
+def last_rounds(trials):
+    """Each candidate's trial at the largest budget it reached, by RMSE."""
+    reached = {}
+    for trial in trials:
+        key = json.dumps(trial['params'], sort_keys=True)
+        if key not in reached or trial['budget'] > reached[key]['budget']:
+            reached[key] = trial
+    return sorted(reached.values(), key=lambda trial: trial['rmse'])
+
+def cheapest_within(trials, tolerance):
+    """The fastest-predicting (then smallest) trial with an RMSE at most tolerance worse than the best."""
+    best_rmse = min(trial['rmse'] for trial in trials)
+    eligible = [trial for trial in trials if trial['rmse'] <= best_rmse * (1 + tolerance)]
+    return min(eligible, key=lambda trial: (trial['predict_us_per_row'], trial['model_bytes'], trial['rmse']))
+
+def tune_stage(stage_name, spec, X_train, y_train, args):
+    print(f"{STAGES[stage_name]['code']} {stage_name}: tuning {args.trials} candidates")
+    trials = successive_halving(X_train, np.asarray(y_train, dtype=float), n_trials=args.trials, eta=args.eta,
+                                max_budget=args.max_trees, folds=args.folds, jobs=args.jobs, seed=args.seed)
+    candidates = last_rounds(trials)
+    front = pareto_front(candidates)
+    chosen = cheapest_within(candidates, args.rmse_tolerance)
+
+    print(f"  {'RMSE':>10} {'budget':>6} {'trees':>6} {'us/row':>8} {'bytes':>9}  params")
+    for trial in candidates:
+        marker = '>' if trial is chosen else '*' if trial in front else ' '
+        print(f"{marker} {trial['rmse']:10.3f} {trial['budget']:6d} {trial['trees']:6d} "
+              f"{trial['predict_us_per_row']:8.2f} {trial['model_bytes']:9d}  {json.dumps(trial['params'])}")
+    print(f"  * Pareto front on RMSE and us/row, > cheapest within {args.rmse_tolerance:.1%} "
+          f"of the best RMSE {candidates[0]['rmse']:.3f}")
+
+    hyperparameters = dict(chosen['params'], n_estimators=chosen['trees'])
+    baseline = spec['hyperparameters']
+    print(f"  chosen: {json.dumps(hyperparameters)} (was {json.dumps(baseline)})")
+    return {'hyperparameters': hyperparameters, 'trials': trials, 'front': front, 'chosen': chosen}